@@ -0,0 +1,95 @@
+# ingestion layer for the dashboard
+# the uploaded csv is hashed, converted once to parquet and kept in a small on-disk cache,
+# so later reruns (and other sessions uploading the same file) skip the slow csv parsing
+# parquet needs pyarrow installed (pip install pyarrow)
+import hashlib
+import os
+
+import pandas as pd
+
+# where the converted files live, next to this script
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "uploads")
+
+# total size the cache is allowed to grow to before old files get evicted (2 GB by default)
+CACHE_MAX_BYTES = int(os.environ.get("INTRO_CACHE_MAX_BYTES", 2 * 1024**3))
+
+# read the upload in 8 MB pieces so hashing never holds a second copy of the file
+CHUNK_SIZE = 8 * 1024**2
+
+
+def hash_upload(uploaded_file):
+    # content hash, so the same data uploaded under a different name still hits the cache
+    digest = hashlib.blake2b(digest_size=20)
+    uploaded_file.seek(0)
+    while True:
+        chunk = uploaded_file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def cache_path(digest):
+    return os.path.join(CACHE_DIR, f"{digest}.parquet")
+
+
+def evict(max_bytes=CACHE_MAX_BYTES, keep=None):
+    # least recently used goes first, we touch the file on every hit so mtime = last use
+    if not os.path.isdir(CACHE_DIR):
+        return
+
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(".parquet"):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            # another session evicted it in the meantime
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        # never evict the file we just wrote, even if it alone is over the budget
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def load_csv(uploaded_file, digest=None):
+    # returns the dataframe and the content hash of the upload
+    if digest is None:
+        digest = hash_upload(uploaded_file)
+    path = cache_path(digest)
+
+    if os.path.exists(path):
+        # cache hit, mark it as recently used
+        os.utime(path)
+        return pd.read_parquet(path), digest
+
+    df = pd.read_csv(uploaded_file)
+    uploaded_file.seek(0)
+
+    # write to a temp file first and rename, so a half written file is never picked up
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        df.to_parquet(tmp_path, index=False)
+    except Exception:
+        # some csvs end up with mixed type columns parquet cant store, just skip caching those
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return df, digest
+    os.replace(tmp_path, path)
+
+    evict(keep=path)
+    return df, digest
@@ -1,16 +1,65 @@
+import os
+import sys
+
 import streamlit as st
-import pandas as pd
+
+# the shared helpers live in common/ at the repo root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.charts import line_chart
+
+import ingest
+from summary import summarise_csv, summarise_parquet
+from value_index import ColumnIndex
 
 
 st.title("Simple Data Dashboard")
 
+
+# one parsed copy per distinct upload, shared by every rerun and session in this process
+# the leading underscore tells streamlit not to hash the file itself, the digest is the key
+@st.cache_resource(max_entries=4)
+def load_dataset(digest, _uploaded_file):
+    df, _ = ingest.load_csv(_uploaded_file, digest)
+    return df
+
+
+# built the first time a column is picked, then reused for the same upload on every rerun
+@st.cache_resource(max_entries=64)
+def column_index(digest, column, _df):
+    return ColumnIndex(_df[column])
+
+
+# summary stats are computed in chunks, once per upload, from the parquet copy load_dataset
+# already made (the csv is only read again if that couldnt be cached)
+@st.cache_data(max_entries=16)
+def data_summary(digest, _uploaded_file):
+    path = ingest.cache_path(digest)
+    if os.path.exists(path):
+        try:
+            return summarise_parquet(path)
+        except FileNotFoundError:
+            # evicted by another session in the meantime
+            pass
+    return summarise_csv(_uploaded_file)
+
+
+def upload_digest(uploaded_file):
+    # hashing a big file takes a while too, so only do it once per upload in this session
+    key = (uploaded_file.name, uploaded_file.size, getattr(uploaded_file, "file_id", None))
+    digests = st.session_state.setdefault("upload_digests", {})
+    if key not in digests:
+        digests[key] = ingest.hash_upload(uploaded_file)
+    return digests[key]
+
+
 # upload file
 uploaded_file = st.file_uploader("Choose a CSV file", type ="csv")
 
 # if there is a file uploaded
 if uploaded_file is not None:
     st.write("File Uploaded...")
-    df = pd.read_csv(uploaded_file)
+    digest = upload_digest(uploaded_file)
+    df = load_dataset(digest, uploaded_file)
 
     st.subheader("Data Preview")
 
@@ -19,7 +68,7 @@ if uploaded_file is not None:
 
     # summary of data
     st.subheader("Data Summary")
-    st.write(df.describe())
+    st.write(data_summary(digest, uploaded_file))
 
     st.subheader("Filter Data")
 
@@ -29,12 +78,13 @@ if uploaded_file is not None:
     # streamlit widget
     selected_column = st.selectbox("Select column", column)
 
-    unique_values = df[selected_column].unique()
+    index = column_index(digest, selected_column, df)
+    unique_values = index.unique()
 
     selected_value = st.selectbox("Select column", unique_values)
 
     # filter out what we filter
-    filtered_df = df[df[selected_column] == selected_value]
+    filtered_df = index.filter(df, selected_value)
 
     st.write(filtered_df)
 
@@ -45,7 +95,7 @@ if uploaded_file is not None:
 
     # if they click on generate plot button
     if st.button("Generate Plot"):
-        st.line_chart(filtered_df.set_index(x_column)[y_column])
+        line_chart(filtered_df.set_index(x_column)[y_column])
     else:
         st.write("Waiting on file upload")
 
@@ -0,0 +1,262 @@
+# single pass summary statistics for big csv files
+# the csv is read in chunks, each chunk updates a running count/mean/std/min/max and a small
+# quantile sketch, so memory stays bounded no matter how big the file is
+# partial summaries can be merged, which is what lets a file be split across processes
+import argparse
+import io
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 500_000
+
+# quantiles reported, same ones df.describe() shows
+PERCENTILES = (0.25, 0.5, 0.75)
+
+
+class ColumnSummary:
+    # running stats for one numeric column
+    # the quantile sketch puts values into log spaced buckets (like DDSketch), so any quantile is
+    # within relative_accuracy of the true value and two sketches merge by adding bucket counts
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared differences from the mean
+        self.min = math.inf
+        self.max = -math.inf
+
+        self.positive = {}  # bucket key -> count
+        self.negative = {}
+        self.zeros = 0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+
+        chunk_mean = values.mean()
+        chunk_m2 = ((values - chunk_mean) ** 2).sum()
+        self._combine(len(values), chunk_mean, chunk_m2, values.min(), values.max())
+
+        finite = values[np.isfinite(values)]
+        self._add_buckets(self.positive, finite[finite > 0])
+        self._add_buckets(self.negative, -finite[finite < 0])
+        self.zeros += int((finite == 0).sum())
+
+    def merge(self, other):
+        self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        for key, count in other.positive.items():
+            self.positive[key] = self.positive.get(key, 0) + count
+        for key, count in other.negative.items():
+            self.negative[key] = self.negative.get(key, 0) + count
+        self.zeros += other.zeros
+        return self
+
+    def std(self):
+        # sample std, same as pandas
+        if self.count < 2:
+            return math.nan
+        return math.sqrt(self.m2 / (self.count - 1))
+
+    def quantile(self, q):
+        total = self.zeros + sum(self.positive.values()) + sum(self.negative.values())
+        if total == 0:
+            return math.nan
+        rank = q * (total - 1)
+
+        # walk the buckets from the most negative value up to the most positive one
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return self._clamp(-self._bucket_value(key))
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._clamp(self._bucket_value(key))
+        return self.max
+
+    def _combine(self, count, mean, m2, min_value, max_value):
+        # parallel variance formula (Chan et al.), works for a chunk or a whole other summary
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta**2 * self.count * count / total
+        self.count = total
+        self.min = min(self.min, min_value)
+        self.max = max(self.max, max_value)
+
+    def _add_buckets(self, buckets, magnitudes):
+        if len(magnitudes) == 0:
+            return
+        keys = np.ceil(np.log(magnitudes) / self.log_gamma).astype(np.int64)
+        keys, counts = np.unique(keys, return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            buckets[key] = buckets.get(key, 0) + count
+
+    def _bucket_value(self, key):
+        # middle of the bucket, in relative terms
+        return 2 * self.gamma**key / (self.gamma + 1)
+
+    def _clamp(self, value):
+        return min(max(value, self.min), self.max)
+
+
+class Summary:
+    # summaries for every numeric column of a csv, built chunk by chunk
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.columns = {}
+        # a column that is text in any chunk is not numeric for the whole file
+        self.non_numeric = set()
+
+    def update(self, chunk):
+        for name in chunk.columns:
+            values = chunk[name]
+            numeric = pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+            if not numeric:
+                # an all empty chunk reads as float, so only real text marks the column
+                if values.notna().any():
+                    self.non_numeric.add(name)
+                continue
+            if name not in self.columns:
+                self.columns[name] = ColumnSummary(self.relative_accuracy)
+            self.columns[name].update(values.to_numpy())
+        return self
+
+    def merge(self, other):
+        for name, column in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(column)
+            else:
+                self.columns[name] = column
+        self.non_numeric |= other.non_numeric
+        return self
+
+    def to_frame(self):
+        # same layout as df.describe()
+        index = ["count", "mean", "std", "min"] + [f"{q:.0%}" for q in PERCENTILES] + ["max"]
+        data = {}
+        for name, column in self.columns.items():
+            if name in self.non_numeric:
+                continue
+            if column.count == 0:
+                data[name] = [0.0] + [math.nan] * (len(index) - 1)
+                continue
+            data[name] = (
+                [float(column.count), column.mean, column.std(), column.min]
+                + [column.quantile(q) for q in PERCENTILES]
+                + [column.max]
+            )
+        return pd.DataFrame(data, index=index)
+
+
+class _RangeReader(io.RawIOBase):
+    # file like object that only reads the bytes between start and end of a file
+    def __init__(self, path, start, end):
+        self.file = open(path, "rb")
+        self.file.seek(start)
+        self.remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.remaining)
+        if size <= 0:
+            return 0
+        data = self.file.read(size)
+        buffer[: len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+
+def _split_ranges(path, parts):
+    # byte ranges that start right after a newline, the first one starts after the header
+    # note: assumes no newlines inside quoted fields
+    size = os.path.getsize(path)
+    with open(path, "rb") as file:
+        file.readline()
+        header_end = file.tell()
+        step = max((size - header_end) // parts, 1)
+        bounds = [header_end]
+        for i in range(1, parts):
+            file.seek(header_end + i * step)
+            file.readline()
+            position = file.tell()
+            if position >= size:
+                break
+            if position > bounds[-1]:
+                bounds.append(position)
+        bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _summarise_range(args):
+    path, start, end, names, chunk_rows, relative_accuracy = args
+    summary = Summary(relative_accuracy)
+    with _RangeReader(path, start, end) as raw:
+        reader = pd.read_csv(io.BufferedReader(raw), names=names, header=None, chunksize=chunk_rows)
+        for chunk in reader:
+            summary.update(chunk)
+    return summary
+
+
+def summarise_csv(source, chunk_rows=CHUNK_ROWS, workers=1, relative_accuracy=0.01):
+    # source can be a path or an open file (like a streamlit upload)
+    # with workers > 1 and a path, the file is split into byte ranges summarised in parallel
+    if workers > 1 and isinstance(source, (str, os.PathLike)):
+        names = pd.read_csv(source, nrows=0).columns.tolist()
+        ranges = _split_ranges(source, workers * 4)
+        jobs = [(source, start, end, names, chunk_rows, relative_accuracy) for start, end in ranges]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_summarise_range, jobs))
+        return reduce(Summary.merge, parts, Summary(relative_accuracy)).to_frame()
+
+    if hasattr(source, "seek"):
+        source.seek(0)
+    summary = Summary(relative_accuracy)
+    for chunk in pd.read_csv(source, chunksize=chunk_rows):
+        summary.update(chunk)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return summary.to_frame()
+
+
+def summarise_parquet(path, chunk_rows=CHUNK_ROWS, relative_accuracy=0.01):
+    # same summary from a parquet file, read a batch of rows at a time like the csv
+    import pyarrow.parquet as pq
+
+    summary = Summary(relative_accuracy)
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+        summary.update(batch.to_pandas())
+    return summary.to_frame()
+
+
+if __name__ == "__main__":
+    # python summary.py big.csv --workers 8
+    parser = argparse.ArgumentParser(description="Summarise a csv file in one pass")
+    parser.add_argument("path")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    print(summarise_csv(args.path, chunk_rows=args.chunk_rows, workers=args.workers))
@@ -0,0 +1,34 @@
+# per column value index for the filter section
+# instead of scanning the whole column on every rerun, each value gets a code and the row
+# positions are grouped by code, so the unique list and the filtered rows become lookups
+import numpy as np
+import pandas as pd
+
+
+class ColumnIndex:
+    def __init__(self, series):
+        # codes[i] is the position of row i's value in self.values (nan counts as its own value)
+        # sort=False keeps the values in order of first appearance, same as series.unique()
+        codes, uniques = pd.factorize(series, sort=False, use_na_sentinel=False)
+        self.values = pd.Index(uniques)
+
+        # row positions grouped by code, rows stay in their original order inside a group
+        self.positions = np.argsort(codes, kind="stable")
+
+        # offsets[c]:offsets[c + 1] is the slice of positions holding code c
+        counts = np.bincount(codes, minlength=len(uniques))
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def unique(self):
+        return self.values
+
+    def rows(self, value):
+        # row positions holding value, empty if it isnt in the column
+        try:
+            code = self.values.get_loc(value)
+        except KeyError:
+            return self.positions[:0]
+        return self.positions[self.offsets[code] : self.offsets[code + 1]]
+
+    def filter(self, df, value):
+        return df.iloc[self.rows(value)]
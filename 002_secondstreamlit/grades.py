@@ -0,0 +1,89 @@
+# loader for the grade matrix in data.csv
+# the csv is parsed once into typed numeric columns, and the two shapes the charts need
+# (wide for the line chart, long for the altair chart) are built straight from the numpy array
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def file_key(path):
+    # changes whenever the file is edited, used as the cache key
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def read_grades(path):
+    # first column is the student name, every other column is a subject score
+    header = pd.read_csv(path, nrows=0).columns
+    dtypes = {subject: np.int32 for subject in header[1:]}
+    return pd.read_csv(path, index_col=0, dtype=dtypes)
+
+
+def student_labels(names):
+    # names are not unique in a big roster, a repeated name gets the student's row number so
+    # every student stays their own column, bar group and selection key
+    names = pd.Index(names).astype(str)
+    repeated = names.duplicated(keep=False)
+    if not repeated.any():
+        return names
+    numbers = np.char.add(" #", (np.arange(len(names)) + 1).astype(str))
+    return pd.Index(np.where(repeated, np.char.add(names.to_numpy(dtype=str), numbers), names))
+
+
+def to_wide(scores):
+    # subjects on the index, one column per student, which is how st.line_chart wants it
+    return pd.DataFrame(
+        scores.to_numpy().T, index=scores.columns, columns=student_labels(scores.index)
+    )
+
+
+def to_long(scores):
+    # one (Student, Subject, Score) row per grade, same order as melt gives (subject by subject)
+    # StudentId is the student's row number (and column number in wide), the key to select by
+    students = student_labels(scores.index).to_numpy()
+    subjects = scores.columns.to_numpy()
+    return pd.DataFrame(
+        {
+            "StudentId": np.tile(np.arange(len(students), dtype=np.int32), len(subjects)),
+            "Student": np.tile(students, len(subjects)),
+            "Subject": np.repeat(subjects, len(students)),
+            "Score": scores.to_numpy().ravel(order="F"),
+        }
+    )
+
+
+def load_grades(path):
+    scores = read_grades(path)
+    return to_wide(scores), to_long(scores)
+
+
+# aggregated views, so only a small table goes into the vega-lite spec instead of every grade
+STATISTICS = {
+    "Mean": lambda values: values.mean(axis=1),
+    "Median": lambda values: np.median(values, axis=1),
+    "25th percentile": lambda values: np.percentile(values, 25, axis=1),
+    "75th percentile": lambda values: np.percentile(values, 75, axis=1),
+    "Min": lambda values: values.min(axis=1),
+    "Max": lambda values: values.max(axis=1),
+}
+
+
+def subject_stats(wide, statistics=tuple(STATISTICS)):
+    # one (Subject, Statistic, Score) row per subject and statistic
+    values = wide.to_numpy(dtype=np.float64)
+    frames = [
+        pd.DataFrame({"Subject": wide.index, "Statistic": name, "Score": STATISTICS[name](values)})
+        for name in statistics
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def top_students(wide, long, n=10):
+    # long rows for the n students with the best average score
+    averages = wide.to_numpy(dtype=np.float64).mean(axis=0)
+    if n >= len(averages):
+        return long
+    # argpartition finds the top n without sorting every student
+    best = np.argpartition(-averages, n - 1)[:n]
+    return long[long["StudentId"].isin(best)]
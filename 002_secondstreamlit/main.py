@@ -1,13 +1,13 @@
 # Imports
 import streamlit as st
-import pandas as pd
 import numpy as np
-import csv
 import random
 import altair as alt
 
 from altair import layer
 
+from grades import file_key, load_grades, subject_stats, top_students
+
 #-----------------------------------------------------------------
 # Intro
  # title block
@@ -27,41 +27,61 @@ st.code(code, language = "python")
 #
 # st.line_chart(chart_data)
 
-with open("data.csv", 'r') as csv_files:
-    reader = csv.reader(csv_files)
-    next(reader, None)
-
-    # initializing empty list to store name of each row
-    names = []
-    grades = []
-
-    for line in reader:
-        # print(line) # just to check if it works
-        names.append(line[0])
-        # print(names)
-
-        grades.append([int(line[1]), int(line[2]), int(line[3]), int(line[4])])
-        # print(grades)
-
-    chart_data = pd.DataFrame(grades, index = names).T
-    print(chart_data)
-
-    st.line_chart(chart_data)
-
-    # transpose to make sure subjects are indexed correctly
-    chart_data = chart_data.T.reset_index()
-    chart_data = chart_data.melt(id_vars=['index'], var_name='Subject', value_name='Score')
-
-    # rename for clarity
-    chart_data.rename(columns={'index': 'Student'}, inplace=True)
-
-    # create grouped bar chart :N is nominal, :Q is quantitaive
-    test = alt.Chart(chart_data).mark_bar().encode(
-        x=alt.X('Subject:N', title='Subjects', axis=alt.Axis(labelAngle=0)),  # Subjects on X-axis
-        y=alt.Y('Score:Q', title='Scores'),  # Scores on Y-axis
-        color=alt.Color('Student:N', legend=alt.Legend(title="Students")),  # Color by student
-        xOffset=alt.X('Student:N')  # Offsets bars so they are grouped instead of stacked
-    ).properties(width=500)
 
-    # create the chart
-    st.altair_chart(test, use_container_width=True)
+# parsed once per version of the file, the mtime/size key makes an edited csv load again
+@st.cache_resource(max_entries=2)
+def cached_grades(path, key):
+    return load_grades(path)
+
+
+@st.cache_data(max_entries=4)
+def cached_subject_stats(key, _wide):
+    return subject_stats(_wide)
+
+
+# above this many students the detailed chart gets too big for the browser
+DETAILED_MAX_STUDENTS = 50
+
+
+# wide: subjects x students for the line chart, long: one row per (student, subject) grade
+grades_key = file_key("data.csv")
+wide_data, long_data = cached_grades("data.csv", grades_key)
+
+st.line_chart(wide_data)
+
+# the bar chart can show every grade, or a table aggregated here on the server
+views = ["Detailed", "Subject statistics", "Top students"]
+n_students = len(wide_data.columns)
+view = st.radio(
+    "Bar chart view",
+    views,
+    index=0 if n_students <= DETAILED_MAX_STUDENTS else 1,
+    horizontal=True,
+)
+
+if view == "Subject statistics":
+    # one bar per statistic for each subject
+    bar_data = cached_subject_stats(grades_key, wide_data)
+    group = 'Statistic:N'
+    legend_title = "Statistics"
+else:
+    if view == "Top students":
+        top_n = st.slider("Number of students", 1, min(n_students, 100), min(n_students, 10))
+        bar_data = top_students(wide_data, long_data, top_n)
+    else:
+        if n_students > DETAILED_MAX_STUDENTS:
+            st.warning(f"Drawing every grade of {n_students:,} students, this can be slow.")
+        bar_data = long_data
+    group = 'Student:N'
+    legend_title = "Students"
+
+# create grouped bar chart :N is nominal, :Q is quantitaive
+test = alt.Chart(bar_data).mark_bar().encode(
+    x=alt.X('Subject:N', title='Subjects', axis=alt.Axis(labelAngle=0)),  # Subjects on X-axis
+    y=alt.Y('Score:Q', title='Scores'),  # Scores on Y-axis
+    color=alt.Color(group, legend=alt.Legend(title=legend_title)),  # Color by student or statistic
+    xOffset=alt.X(group)  # Offsets bars so they are grouped instead of stacked
+).properties(width=500)
+
+# create the chart
+st.altair_chart(test, use_container_width=True)
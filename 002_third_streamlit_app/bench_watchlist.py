@@ -0,0 +1,94 @@
+# benchmark: sequential vs concurrent watchlist fetching against a local stub server
+# the stub serves fake daily bars as csv after a fixed delay, which stands in for network latency
+# run with: python bench_watchlist.py --tickers 100 --latency 0.2 --workers 16
+import argparse
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from price_store import PriceStore
+from watchlist import HttpProvider, LimitedProvider, RateLimiter, fetch_many, fetch_sequential
+
+
+def make_handler(latency):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep alive, so pooled connections actually get reused
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            ticker = url.path.rsplit("/", 1)[-1]
+            query = parse_qs(url.query)
+            dates = pd.date_range(query["start"][0], query["end"][0], freq="B", inclusive="left")
+
+            rng = np.random.default_rng(abs(hash(ticker)) % 2**32)
+            close = 100 + rng.standard_normal(len(dates)).cumsum()
+            bars = pd.DataFrame(
+                {
+                    "Open": close,
+                    "High": close + 1,
+                    "Low": close - 1,
+                    "Close": close,
+                    "Volume": rng.integers(1_000, 1_000_000, len(dates)),
+                },
+                index=pd.Index(dates, name="Date"),
+            )
+            body = bars.to_csv().encode()
+
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return StubHandler
+
+
+def run(fetch, url, tickers, workers, rate, **kwargs):
+    # fresh store every run so nothing comes from the disk cache
+    with tempfile.TemporaryDirectory() as directory:
+        provider = LimitedProvider(HttpProvider(url, pool_size=workers), RateLimiter(rate, burst=workers))
+        store = PriceStore(provider, directory)
+        started = time.perf_counter()
+        first = None
+        failed = 0
+        for _, _, error in fetch(store, tickers, "2015-01-01", "2025-01-01", **kwargs):
+            first = first or time.perf_counter() - started
+            failed += error is not None
+        return time.perf_counter() - started, first, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark watchlist fetching")
+    parser.add_argument("--tickers", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=200.0, help="requests per second")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    tickers = [f"T{i:03d}" for i in range(args.tickers)]
+
+    results = {
+        "sequential": run(fetch_sequential, url, tickers, args.workers, args.rate),
+        f"concurrent ({args.workers} threads)": run(
+            fetch_many, url, tickers, args.workers, args.rate, max_workers=args.workers
+        ),
+    }
+    server.shutdown()
+
+    for name, (total, first, failed) in results.items():
+        print(
+            f"{name:>24}: {total:6.2f}s total, first ticker after {first:.2f}s, "
+            f"{len(tickers) / total:6.1f} tickers/s, {failed} failed"
+        )
@@ -1,6 +1,53 @@
-import yfinance as yf
+import os
+import sys
+from datetime import date
+
 import streamlit as st
 
+# the shared helpers live in common/ at the repo root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.charts import line_chart
+
+from price_store import PriceStore, YFinanceProvider
+from watchlist import LimitedProvider, RateLimiter, fetch_many
+
+
+# rate limited and retried, one per process so the limit holds across every session
+@st.cache_resource
+def watchlist_store():
+    return PriceStore(LimitedProvider(YFinanceProvider(), RateLimiter(rate=5)))
+
+
+mode = st.sidebar.radio("Mode", ["Single ticker", "Watchlist"])
+
+if mode == "Watchlist":
+    st.write("# Watchlist")
+
+    text = st.sidebar.text_area("Tickers (comma or newline separated)", "GOOG, AAPL, MSFT, AMZN, META")
+    # dict.fromkeys drops duplicates but keeps the order they were typed in
+    tickers = list(dict.fromkeys(text.replace(",", " ").upper().split()))
+    workers = st.sidebar.slider("Parallel downloads", 1, 32, 8)
+
+    progress = st.progress(0.0)
+
+    # one slot per ticker in a grid, each is filled in as soon as its data arrives
+    columns = st.columns(3)
+    slots = {ticker: columns[i % 3].empty() for i, ticker in enumerate(tickers)}
+
+    results = fetch_many(watchlist_store(), tickers, "2010-5-31", "2025-3-1", max_workers=workers)
+    for done, (ticker, bars, error) in enumerate(results, start=1):
+        with slots[ticker].container():
+            st.write(f"**{ticker}**")
+            if error is not None:
+                st.error(f"Could not load {ticker}: {error}")
+            elif len(bars) == 0:
+                st.warning(f"No data for {ticker}")
+            else:
+                line_chart(bars.Close, max_points=500)
+        progress.progress(done / len(tickers), text=f"{done}/{len(tickers)} tickers loaded")
+
+    st.stop()
+
 st.write(
     """
 # Simple Stock Price App
@@ -14,22 +61,40 @@ Shown are the stock closing price & volume of
 # yfinance is open source python library that provides free acces to financial data on Yahoofinacne
 ticker = "GOOG"
 
-# get data from yfinance using the ticker defined
-ticker_data = yf.Ticker(ticker)
 
-print("hello")
-tickerDf = ticker_data.history(period="1d", start="2010-5-31", end="2025-3-1")
+# one store per process, it keeps the bars on disk so only new dates get downloaded
+@st.cache_resource
+def price_store():
+    return PriceStore(YFinanceProvider())
+
+
+# date range to chart, the bar size is picked from how long it is
+start_date, end_date = st.sidebar.slider(
+    "Date range",
+    min_value=date(2010, 5, 31),
+    max_value=date(2025, 3, 1),
+    value=(date(2010, 5, 31), date(2025, 3, 1)),
+)
+
+# get data from yfinance using the ticker defined
+# a failed download raises (and is tried again next time) instead of charting nothing
+try:
+    tickerDf, resolution = price_store().chart_bars(ticker, start=start_date, end=end_date)
+except Exception as error:
+    st.error(f"Could not load {ticker}: {error}")
+    st.stop()
+st.caption(f"Showing {resolution} bars")
 
 st.write(
     """
          ### Closing price
          # """
 )
-st.line_chart(tickerDf.Close)
+line_chart(tickerDf.Close)
 
 st.write(
     """
          ### Volume price
          # """
 )
-st.line_chart(tickerDf.Volume)
+line_chart(tickerDf.Volume)
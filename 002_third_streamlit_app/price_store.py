@@ -0,0 +1,216 @@
+# local price history store
+# every ticker gets a parquet file with the bars fetched so far and a small json file with the
+# date range already covered, so a page load only downloads the dates it doesnt have yet
+# weekly/monthly/... rollups are kept next to the bars and updated whenever new bars are saved
+# the provider is pluggable: anything with a history(ticker, start, end) method works, which lets
+# tests use FrameProvider instead of hitting yahoo finance
+import json
+import os
+import threading
+
+import pandas as pd
+
+from rollups import MAX_BARS, RESOLUTIONS, choose_resolution, period_start, update_rollup
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "prices")
+
+# one lock per ticker file, shared by every store on the same directory, so two sessions updating
+# the same ticker dont both read the old covered range and drop each other's bars
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _ticker_lock(path):
+    with _locks_lock:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def _tmp_path(path):
+    # unique per process and thread, so concurrent writers never share a temp file
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+# providers raise when a download fails, an empty frame means there really are no bars in the
+# range (before the ipo, after a delisting, a holiday), only ranges that answered get covered
+
+
+def _no_data_errors():
+    # the yfinance errors that mean "no bars in this range" rather than a failed download
+    try:
+        from yfinance import exceptions
+    except ImportError:
+        return ()
+    names = ["YFPricesMissingError", "YFTzMissingError"]
+    return tuple(getattr(exceptions, name) for name in names if hasattr(exceptions, name))
+
+
+class YFinanceProvider:
+    # daily bars from yahoo finance, end is exclusive like yfinance's own end
+    # yfinance already shares one http session between tickers, pass session to use your own
+    # by default yfinance answers rate limits and network errors with an empty frame, so errors
+    # are raised here and only yfinance's "no prices" errors turn into an empty frame
+    def __init__(self, session=None):
+        self.session = session
+
+    def history(self, ticker, start, end):
+        import yfinance as yf
+
+        try:
+            return yf.Ticker(ticker, session=self.session).history(
+                interval="1d",
+                start=start.strftime("%Y-%m-%d"),
+                end=end.strftime("%Y-%m-%d"),
+                raise_errors=True,
+            )
+        except _no_data_errors():
+            return pd.DataFrame()
+
+
+class FrameProvider:
+    # serves bars from dataframes already in memory, for tests and offline use
+    def __init__(self, frames):
+        self.frames = frames
+        self.calls = []
+
+    def history(self, ticker, start, end):
+        self.calls.append((ticker, start, end))
+        return _between(self.frames[ticker], start, end)
+
+
+def _match_tz(timestamp, index):
+    # yfinance gives exchange local, tz aware dates, so naive dates need the same tz to compare
+    timestamp = pd.Timestamp(timestamp)
+    tz = getattr(index, "tz", None)
+    if tz is not None and timestamp.tzinfo is None:
+        return timestamp.tz_localize(tz)
+    return timestamp
+
+
+def _between(bars, start, end):
+    # rows with start <= date < end
+    index = bars.index
+    return bars[(index >= _match_tz(start, index)) & (index < _match_tz(end, index))]
+
+
+class PriceStore:
+    def __init__(self, provider, directory=CACHE_DIR):
+        self.provider = provider
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, ticker):
+        base = os.path.join(self.directory, ticker.upper())
+        return f"{base}.parquet", f"{base}.json"
+
+    def _rollup_path(self, ticker, resolution):
+        return os.path.join(self.directory, f"{ticker.upper()}.{resolution}.parquet")
+
+    def _write(self, frame, path):
+        # temp file + rename so a crash never leaves a half written file behind
+        tmp = _tmp_path(path)
+        frame.to_parquet(tmp)
+        os.replace(tmp, path)
+
+    def _load(self, ticker):
+        data_path, meta_path = self._paths(ticker)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None, None
+        with open(meta_path) as file:
+            meta = json.load(file)
+        covered = pd.Timestamp(meta["start"]), pd.Timestamp(meta["end"])
+        return pd.read_parquet(data_path), covered
+
+    def _save(self, ticker, bars, covered, prepended=True):
+        data_path, meta_path = self._paths(ticker)
+        self._write(bars, data_path)
+
+        if len(bars):
+            for resolution in RESOLUTIONS:
+                path = self._rollup_path(ticker, resolution)
+                existing = pd.read_parquet(path) if os.path.exists(path) else None
+                self._write(update_rollup(existing, bars, resolution, prepended), path)
+
+        # the covered range goes last, so it never claims bars that didnt make it to disk
+        tmp = _tmp_path(meta_path)
+        with open(tmp, "w") as file:
+            json.dump({"start": covered[0].isoformat(), "end": covered[1].isoformat()}, file)
+        os.replace(tmp, meta_path)
+
+    def history(self, ticker, start, end):
+        # daily bars in [start, end), only the part not covered yet is fetched from the provider
+        # the load, fetch and save of one ticker runs under its lock
+        with _ticker_lock(self._paths(ticker)[0]):
+            return self._history(ticker, start, end)
+
+    def _history(self, ticker, start, end):
+        start = pd.Timestamp(start).normalize()
+        end = pd.Timestamp(end).normalize()
+
+        # bars for today are still moving, so never mark today (or later) as covered
+        fetch_end = min(end, pd.Timestamp.today().normalize())
+
+        bars, covered = self._load(ticker)
+        if covered is None:
+            missing = [(start, fetch_end)]
+        else:
+            missing = [(start, covered[0]), (covered[1], fetch_end)]
+        missing = [(a, b) for a, b in missing if a < b]
+
+        if missing:
+            fetched = []
+            error = None
+            previous = covered
+            # first stored bar, the rollups are only rebuilt if older bars are added
+            first = bars.index[0] if bars is not None and len(bars) else None
+            for a, b in missing:
+                try:
+                    part = self.provider.history(ticker, a, b)
+                except Exception as e:
+                    # a failed range stays uncovered, the other one is still saved
+                    error = e
+                    continue
+                if part is not None and len(part):
+                    fetched.append(part)
+                # every range that answered extends the covered range, empty or not
+                if covered is None:
+                    covered = (a, b)
+                elif b <= covered[0]:
+                    covered = (a, covered[1])
+                else:
+                    covered = (covered[0], b)
+
+            parts = [part for part in [bars, *fetched] if part is not None and len(part)]
+            if parts:
+                bars = pd.concat(parts)
+                bars = bars[~bars.index.duplicated(keep="last")].sort_index()
+            if covered != previous:
+                prepended = first is None or (bars is not None and bars.index[0] < first)
+                self._save(ticker, bars if bars is not None else pd.DataFrame(), covered, prepended)
+            if error is not None:
+                raise error
+
+        # if today is requested, the still moving bar is fetched fresh but not stored
+        if end > fetch_end:
+            today = self.provider.history(ticker, fetch_end, end)
+            if bars is None:
+                bars = today
+            elif len(today):
+                bars = pd.concat([bars, today])
+                bars = bars[~bars.index.duplicated(keep="last")].sort_index()
+
+        if bars is None:
+            return pd.DataFrame()
+        return _between(bars, start, end)
+
+    def chart_bars(self, ticker, start, end, max_bars=MAX_BARS):
+        # bars for [start, end) at the finest resolution that stays under max_bars
+        # returns the bars and the resolution name
+        bars = self.history(ticker, start, end)
+        resolution = choose_resolution(start, end, max_bars)
+        path = self._rollup_path(ticker, resolution)
+        if not os.path.exists(path):
+            return bars, "daily"
+
+        # rollups are indexed by period start, so the period holding start is included too
+        rolled = pd.read_parquet(path)
+        in_range = (rolled.index >= period_start(start, resolution)) & (rolled.index < pd.Timestamp(end))
+        return rolled[in_range], resolution
@@ -0,0 +1,63 @@
+# OHLCV rollups at coarser resolutions
+# long histories are rolled up into daily/weekly/monthly/quarterly bars, so a chart over many
+# years plots a few hundred bars instead of every (possibly intraday) bar
+import pandas as pd
+
+# how each column is combined when several bars become one
+AGGREGATIONS = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+# resolution name -> pandas period frequency, finest first
+RESOLUTIONS = {"daily": "D", "weekly": "W", "monthly": "M", "quarterly": "Q"}
+
+# calendar days covered by one bar, used to guess how many bars a date span gives
+DAYS_PER_BAR = {"daily": 1, "weekly": 7, "monthly": 30.4, "quarterly": 91.3}
+
+# a chart never gets more bars than this
+MAX_BARS = 2000
+
+
+def _naive(index):
+    # periods dont carry a timezone, so use the exchange local wall clock time
+    return index.tz_localize(None) if getattr(index, "tz", None) is not None else index
+
+
+def period_start(timestamp, resolution):
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_localize(None)
+    return timestamp.to_period(RESOLUTIONS[resolution]).start_time
+
+
+def rollup(bars, resolution):
+    # one row per period, indexed by the period's first day
+    columns = {column: how for column, how in AGGREGATIONS.items() if column in bars.columns}
+    periods = _naive(bars.index).to_period(RESOLUTIONS[resolution])
+    rolled = bars[list(columns)].groupby(periods).agg(columns)
+    rolled.index = rolled.index.to_timestamp()
+    return rolled
+
+
+def update_rollup(existing, bars, resolution, prepended=True):
+    # bars is the full history, existing the rollup built from an earlier version of it
+    # prepended says whether bars older than the first stored bar were added, the rollup cant tell
+    # by itself (its first period starts before the first bar, so a backfill inside that period
+    # looks like nothing changed)
+    # when bars were only appended, just the last (possibly incomplete) period and the new ones
+    # are recomputed, anything else (older bars added) rebuilds the rollup
+    if existing is None or len(existing) == 0 or len(bars) == 0 or prepended:
+        return rollup(bars, resolution)
+
+    index = _naive(bars.index)
+
+    last_start = existing.index[-1]
+    tail = rollup(bars[index >= last_start], resolution)
+    return pd.concat([existing.iloc[:-1], tail])
+
+
+def choose_resolution(start, end, max_bars=MAX_BARS):
+    # finest resolution that keeps the chart under max_bars
+    days = max((pd.Timestamp(end) - pd.Timestamp(start)).days, 1)
+    for resolution in RESOLUTIONS:
+        if days / DAYS_PER_BAR[resolution] <= max_bars:
+            return resolution
+    return list(RESOLUTIONS)[-1]
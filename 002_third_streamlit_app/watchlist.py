@@ -0,0 +1,102 @@
+# concurrent fetching for a watchlist of tickers
+# histories are fetched on a bounded thread pool, every request to the data source goes through
+# a shared rate limiter and is retried with backoff, and results are handed back as they finish
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import StringIO
+
+import pandas as pd
+
+
+class RateLimiter:
+    # token bucket shared by all threads: at most `rate` requests per second, bursts up to `burst`
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(int(rate), 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class LimitedProvider:
+    # wraps another provider with rate limiting and retries
+    def __init__(self, provider, limiter=None, retries=3, backoff=0.5):
+        self.provider = provider
+        self.limiter = limiter
+        self.retries = retries
+        self.backoff = backoff
+
+    def history(self, ticker, start, end):
+        for attempt in range(self.retries + 1):
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                return self.provider.history(ticker, start, end)
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                # 0.5s, 1s, 2s, ... between attempts
+                time.sleep(self.backoff * 2**attempt)
+
+
+class HttpProvider:
+    # bars from a plain http endpoint returning csv, GET {base_url}/history/{ticker}?start=..&end=..
+    # one requests session is shared, so connections are kept alive and reused by every thread
+    def __init__(self, base_url, pool_size=32, timeout=10):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def history(self, ticker, start, end):
+        response = self.session.get(
+            f"{self.base_url}/history/{ticker}",
+            params={"start": start.strftime("%Y-%m-%d"), "end": end.strftime("%Y-%m-%d")},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return pd.read_csv(StringIO(response.text), index_col=0, parse_dates=True)
+
+
+def fetch_many(store, tickers, start, end, max_workers=8):
+    # yields (ticker, bars, error) in the order the fetches finish
+    # if the caller stops early (a streamlit rerun or stop closes the generator), the tickers not
+    # started yet are cancelled instead of waiting for all of them like the pool's with block would
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {pool.submit(store.history, ticker, start, end): ticker for ticker in tickers}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                yield ticker, future.result(), None
+            except Exception as error:
+                yield ticker, None, error
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def fetch_sequential(store, tickers, start, end):
+    # same as fetch_many, one ticker after the other, kept for comparison
+    for ticker in tickers:
+        try:
+            yield ticker, store.history(ticker, start, end), None
+        except Exception as error:
+            yield ticker, None, error
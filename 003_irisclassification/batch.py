@@ -0,0 +1,91 @@
+# batch scoring for csv files of flower measurements
+# the file is read in chunks, each chunk is scored with one vectorised predict_proba call
+# (optionally on a process pool) and written straight to the output, so memory stays bounded
+# run from the command line with: python batch.py measurements.csv predictions.csv --workers 4
+import argparse
+import os
+import sys
+
+import numpy as np
+
+# the shared helpers live in common/ at the repo root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.chunks import score_csv_chunks
+
+from model import HYPERPARAMETERS, load_or_train
+
+FEATURES = ["sepal_length", "sepal_width", "petal_length", "petal_width"]
+
+# the only directory the app may read server side csv files from
+DATA_DIR = os.environ.get(
+    "IRIS_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+)
+
+CHUNK_ROWS = 200_000
+
+# set in every worker process (or this one, without workers) by _init_worker
+_model = None
+
+
+def _init_worker(params):
+    # each worker loads the saved model once instead of receiving it with every chunk
+    global _model
+    _model = load_or_train(params)
+
+
+def data_path(path, base=DATA_DIR):
+    # path (relative to base, or absolute) resolved with symlinks, ValueError if it leaves base
+    base = os.path.realpath(base)
+    resolved = os.path.realpath(os.path.join(base, path))
+    if os.path.commonpath([base, resolved]) != base:
+        raise ValueError(f"only files under {base} can be scored")
+    return resolved
+
+
+def score_chunk(chunk):
+    # the feature columns plus the predicted species and one probability column per class,
+    # and the rows per species, other input columns are not copied to the output
+    clf, target_names, _ = _model
+    missing = [name for name in FEATURES if name not in chunk.columns]
+    if missing:
+        raise ValueError(f"csv is missing the columns: {', '.join(missing)}")
+
+    scored = chunk[FEATURES].copy()
+    proba = clf.predict_proba(scored.to_numpy(dtype=np.float64))
+    scored["species"] = target_names[proba.argmax(axis=1)]
+    for i, name in enumerate(target_names):
+        scored[f"proba_{name}"] = proba[:, i]
+    return scored, scored["species"].value_counts()
+
+
+def score_csv(source, output, workers=1, chunk_rows=CHUNK_ROWS, params=None, progress=None):
+    # source is a path or an open binary file, output a path
+    # progress(rows done, fraction of the input read) is called after every chunk
+    # returns the number of rows scored per species
+    params = dict(HYPERPARAMETERS if params is None else params)
+    results = score_csv_chunks(
+        source, output, score_chunk, workers, chunk_rows, _init_worker, (params,), progress
+    )
+
+    counts = {}
+    for _, chunk_counts in results:
+        for species, count in chunk_counts.items():
+            counts[species] = counts.get(species, 0) + int(count)
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a csv of iris measurements")
+    parser.add_argument("source")
+    parser.add_argument("output")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    def report(rows, fraction):
+        print(f"\r{rows:,} rows scored ({fraction:.0%})", end="", flush=True)
+
+    counts = score_csv(args.source, args.output, args.workers, args.chunk_rows, progress=report)
+    print()
+    for species, count in counts.items():
+        print(f"{species}: {count:,}")
@@ -1,11 +1,21 @@
-# to get iris dataset
-from sklearn import datasets
+import json
+import os
+import sys
 
-# get random forest
-from sklearn.ensemble import RandomForestClassifier
 import pandas as pd
 import streamlit as st
 
+# the shared helpers live in common/ at the repo root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.chunks import scratch_file
+from common.forest import CompiledForest
+
+# trains or loads the saved random forest
+from model import HYPERPARAMETERS, load_or_train
+
+# scores whole csv files in chunks
+from batch import DATA_DIR, FEATURES, data_path, score_csv
+
 # Animated text
 st.markdown(
     """
@@ -70,37 +80,38 @@ df = user_input_features()
 st.subheader("User Input parameters")
 st.write(df)
 
-# load iris dataset
-iris = datasets.load_iris()
 
-# by default, this bundle dataset if x is .data and y is.target
-X = iris.data
-Y = iris.target
 
+# one model per process, shared by every session, so a slider move only runs a prediction
+# params are passed as json so streamlit can hash them, new params train a new version
+# the forest is flattened into numpy arrays once, which makes a single row prediction much cheaper
+@st.cache_resource
+def get_model(params_json):
+    clf, target_names, version = load_or_train(json.loads(params_json))
+    return CompiledForest(clf), target_names, version
 
-# print(X)
 
-# initializing random forest classifier
-clf = RandomForestClassifier()
+clf, target_names, model_version = get_model(json.dumps(HYPERPARAMETERS, sort_keys=True))
 
-# fitting data to model
-clf.fit(X, Y)
+# the model was fit on a plain array, so predict on the values (no feature name warning)
+X_input = df.to_numpy()
 
 # this will give wht the random forest predict based on user
-prediction = clf.predict(df)
+prediction = clf.predict(X_input)
 
 # returns the probability of the
-prediction_proba = clf.predict_proba(df)
+prediction_proba = clf.predict_proba(X_input)
 
 # subheader
 st.subheader("Class labels and their corresponding index number")
-target_df = pd.DataFrame(iris.target_names, columns=["species"])
+target_df = pd.DataFrame(target_names, columns=["species"])
 # st.write(iris.target_names)
 st.write(target_df)
 
 # prediction
 st.subheader("Prediction")
-st.write(iris.target_names[prediction])
+st.caption(f"Model version {model_version}")
+st.write(target_names[prediction])
 
 ## prediction proba
 # st.subheader("Prediction probability")
@@ -108,3 +119,34 @@ st.write(iris.target_names[prediction])
 
 proba_df = pd.DataFrame(prediction_proba, columns=["Setosa", "Versicolor", "Virginica"])
 st.write(proba_df)
+
+# batch mode, scores a whole csv of measurements instead of the slider values
+st.subheader("Batch scoring")
+st.write(f"Upload a csv (or name one in {DATA_DIR} on the server) with the columns {', '.join(FEATURES)}")
+
+batch_file = st.file_uploader("Measurements csv", type=["csv"])
+batch_path = st.text_input(f"...or path to a csv in {DATA_DIR}")
+workers = st.slider("Worker processes", 1, os.cpu_count() or 1, 1)
+
+batch_source = batch_file if batch_file is not None else batch_path.strip() or None
+if batch_source is not None and st.button("Score file"):
+    progress = st.progress(0.0)
+
+    def report(rows, fraction):
+        progress.progress(fraction, text=f"{rows:,} rows scored")
+
+    # results go to a file on disk as they are scored, never into one big dataframe
+    # (removed again after the download button has read it)
+    with scratch_file("iris_predictions") as output_path:
+        try:
+            # a typed in path can only point into the data directory
+            if isinstance(batch_source, str):
+                batch_source = data_path(batch_source)
+            counts = score_csv(batch_source, output_path, workers=workers, progress=report)
+        except (ValueError, OSError) as error:
+            st.error(f"Could not score the file: {error}")
+        else:
+            progress.progress(1.0, text="Done")
+            st.write(pd.Series(counts, name="rows").rename_axis("species"))
+            with open(output_path, "rb") as file:
+                st.download_button("Download predictions", file, file_name="iris_predictions.csv", mime="text/csv")
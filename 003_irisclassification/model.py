@@ -0,0 +1,57 @@
+# model lifecycle for the iris app
+# the forest is trained once and saved under a version made from the training data, the
+# hyperparameters and the sklearn version, so it is only retrained when one of those changes
+import hashlib
+import json
+import os
+import pickle
+
+import sklearn
+from sklearn import datasets
+from sklearn.ensemble import RandomForestClassifier
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+
+# fixed random_state so the same version always gives the same forest
+HYPERPARAMETERS = {"n_estimators": 100, "random_state": 42}
+
+
+def model_version(X, Y, params):
+    digest = hashlib.sha256()
+    digest.update(X.tobytes())
+    digest.update(Y.tobytes())
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    digest.update(sklearn.__version__.encode())
+    return digest.hexdigest()[:16]
+
+
+def artifact_path(version):
+    return os.path.join(MODEL_DIR, f"iris-{version}.pkl")
+
+
+def train(X, Y, params):
+    clf = RandomForestClassifier(**params)
+    clf.fit(X, Y)
+    return clf
+
+
+def load_or_train(params=None):
+    # returns (model, target names, version)
+    params = dict(HYPERPARAMETERS if params is None else params)
+    iris = datasets.load_iris()
+    version = model_version(iris.data, iris.target, params)
+    path = artifact_path(version)
+
+    if os.path.exists(path):
+        with open(path, "rb") as file:
+            clf = pickle.load(file)
+    else:
+        clf = train(iris.data, iris.target, params)
+        # write to a temp file first and rename, so other processes never load half a model
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump(clf, file)
+        os.replace(tmp_path, path)
+
+    return clf, iris.target_names, version
@@ -0,0 +1,94 @@
+# full file scoring for uploaded penguin csvs
+# the file is read in chunks, every chunk is encoded with the saved schema and scored in one
+# vectorised call (optionally on a process pool), predictions are written straight to the output
+# and only running totals (species counts, probability histograms) are kept in memory
+# run from the command line with: python batch.py survey.csv predictions.csv --workers 4
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# the shared helpers live in common/ at the repo root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.chunks import score_csv_chunks
+from common.registry import registry
+
+from encoding import encode, load_schema
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "penguins_clf.pkl")
+
+SPECIES = np.array(["Adelie", "Chinstrap", "Gentoo"])
+
+CHUNK_ROWS = 100_000
+
+# probability histograms use this many equal bins between 0 and 1
+BINS = 20
+
+# set in every worker process (or this one, without workers) by _init_worker
+_model = None
+_schema = None
+
+
+def _init_worker(model_path):
+    # the registry memory maps the forest, so every worker shares the same tree arrays
+    global _model, _schema
+    _model = registry.get(model_path)
+    _schema = load_schema()
+
+
+def score_chunk(chunk):
+    # returns the per row predictions, the species counts and the probability histograms
+    # the model was trained with species encoded as 0, 1, 2
+    proba = _model.predict_proba(encode(chunk, _schema))
+    labels = _model.classes_[proba.argmax(axis=1)]
+
+    scored = chunk.copy()
+    scored["species"] = SPECIES[labels]
+    for i, name in enumerate(SPECIES):
+        scored[f"proba_{name}"] = proba[:, i]
+
+    counts = np.bincount(labels, minlength=len(SPECIES))
+    histograms = np.stack(
+        [np.histogram(proba[:, i], bins=BINS, range=(0, 1))[0] for i in range(len(SPECIES))]
+    )
+    return scored, counts, histograms
+
+
+def score_csv(source, output, workers=1, chunk_rows=CHUNK_ROWS, progress=None):
+    # source is a path or an open binary file (like a streamlit upload), output a path
+    # progress(rows done, fraction of the input read) is called after every chunk
+    # returns species counts and a dataframe of probability histograms (bins x species)
+    results = score_csv_chunks(
+        source, output, score_chunk, workers, chunk_rows, _init_worker, (MODEL_PATH,), progress
+    )
+
+    counts = np.zeros(len(SPECIES), dtype=np.int64)
+    histograms = np.zeros((len(SPECIES), BINS), dtype=np.int64)
+    for _, chunk_counts, chunk_histograms in results:
+        counts += chunk_counts
+        histograms += chunk_histograms
+
+    edges = np.linspace(0, 1, BINS + 1)
+    bins = [f"{low:.2f}-{high:.2f}" for low, high in zip(edges[:-1], edges[1:])]
+    return (
+        pd.Series(counts, index=SPECIES, name="rows"),
+        pd.DataFrame(histograms.T, index=pd.Index(bins, name="probability"), columns=SPECIES),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score every row of a penguin csv")
+    parser.add_argument("source")
+    parser.add_argument("output")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    def report(rows, fraction):
+        print(f"\r{rows:,} rows scored ({fraction:.0%})", end="", flush=True)
+
+    counts, _ = score_csv(args.source, args.output, args.workers, args.chunk_rows, progress=report)
+    print()
+    print(counts.to_string())
@@ -0,0 +1,48 @@
+# fixed vocabulary one hot encoder for the penguin features
+# the categories and the output column order are saved next to the model when it is built,
+# so encoding an input only touches the rows being scored (never the training csv)
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "penguins_encoder.json")
+
+# same columns and order the notebook one hot encoded
+NUMERIC = ["bill_length_mm", "bill_depth_mm", "flipper_length_mm", "body_mass_g"]
+CATEGORICAL = ["sex", "island"]
+
+
+def build_schema(penguins):
+    # vocabulary from the training data, sorted like pd.get_dummies sorts it
+    categories = {col: sorted(penguins[col].dropna().unique().tolist()) for col in CATEGORICAL}
+    columns = list(NUMERIC)
+    for col in CATEGORICAL:
+        columns += [f"{col}_{value}" for value in categories[col]]
+    return {"version": 1, "numeric": list(NUMERIC), "categories": categories, "columns": columns}
+
+
+def save_schema(schema, path=SCHEMA_PATH):
+    with open(path, "w") as file:
+        json.dump(schema, file, indent=2)
+
+
+def load_schema(path=SCHEMA_PATH):
+    with open(path) as file:
+        return json.load(file)
+
+
+def encode(df, schema):
+    # one hot encodes df with the saved vocabulary, columns always come out in training order
+    # a category the model never saw just gets all zeros
+    missing = [col for col in schema["numeric"] + list(schema["categories"]) if col not in df.columns]
+    if missing:
+        raise ValueError(f"input is missing the columns: {', '.join(missing)}")
+
+    encoded = {col: df[col].to_numpy(dtype=np.float64) for col in schema["numeric"]}
+    for col, values in schema["categories"].items():
+        column = df[col].to_numpy()
+        for value in values:
+            encoded[f"{col}_{value}"] = column == value
+    return pd.DataFrame(encoded, columns=schema["columns"], index=df.index)
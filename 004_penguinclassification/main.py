@@ -1,8 +1,19 @@
+import os
+import sys
+
 import streamlit as st
 import pandas as pd
 import numpy as np
-import pickle
-from sklearn.ensemble import RandomForestClassifier
+
+# the shared helpers live in common/ at the repo root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.chunks import scratch_file
+from common.registry import registry
+
+from encoding import encode, load_schema
+
+# scores every row of an uploaded csv in chunks
+from batch import score_csv
 
 st.write(
     """
@@ -36,7 +47,9 @@ uploaded_file = st.sidebar.file_uploader(
 
 # if the user uplaods their own csv file, then just load tht
 if uploaded_file is not None:
-    input_df = pd.read_csv(uploaded_file)
+    # only the first row is shown and predicted here, the whole file is scored further down
+    input_df = pd.read_csv(uploaded_file, nrows=1)
+    uploaded_file.seek(0)
 
 # then user can just slide values. but make sure the values correspond exactly to how we build the classifier model
 else:
@@ -71,26 +84,15 @@ else:
     input_df = user_input()
 
 
-# for encoding its easeir to conbine the user input with entire penguins dataset
-penguins_raw = pd.read_csv("penguins_cleaned.csv")  # this includes the target(species)
-penguins = penguins_raw.drop(columns=["species"])
+# the encoder saved by model_building.py knows every category and the training column order,
+# so only the input rows get encoded, the training csv isnt needed anymore
+@st.cache_resource
+def load_encoder():
+    return load_schema()
 
-df = pd.concat([input_df, penguins], axis=0)
-# st.write(df)
-# st.write(penguins_raw.head())
 
-## now is the part where we encode err thing
-encode = ["sex", "island"]
-
-for col in encode:
-    # get the one hot encoding of the sex and island column
-    dummy = pd.get_dummies(df[col], prefix=col)
-    # combines the encoded columns wise
-    df = pd.concat([df, dummy], axis=1)
-    del df[col]
-
-# then selects the first row of the df, since the user input is above it
-df = df[:1]
+# only the first row is predicted for now
+df = encode(input_df[:1], load_encoder())
 
 # st.write(df)
 
@@ -103,8 +105,9 @@ else:
     st.write("Awaiting CSV file to be uploaded. Currently using below values")
     st.write(df)
 
-# load classifier
-load_clf = pickle.load(open("penguins_clf.pkl", "rb"))
+# load classifier through the shared registry: loaded once per process, memory mapped arrays
+# shared with other worker processes, and reloaded only when the pickle's contents change
+load_clf = registry.get("penguins_clf.pkl")
 
 # apply model to make prediction
 prediction = load_clf.predict(df)
@@ -128,3 +131,42 @@ st.markdown(
 )
 
 st.write(df_prediction_proba)
+
+# score every row of the uploaded file, not just the first one
+if uploaded_file is not None:
+    st.markdown(
+        "<h2 style='text-decoration: underline;'>Whole File</h2>", unsafe_allow_html=True
+    )
+    workers = st.slider("Worker processes", 1, os.cpu_count() or 1, 1)
+
+    if st.button("Score every row"):
+        progress = st.progress(0.0)
+
+        def report(rows, fraction):
+            progress.progress(fraction, text=f"{rows:,} rows scored")
+
+        # predictions go to a file on disk chunk by chunk, only the totals stay in memory
+        # (removed again after the download button has read it)
+        with scratch_file("penguin_predictions") as output_path:
+            try:
+                species_counts, histograms = score_csv(
+                    uploaded_file, output_path, workers=workers, progress=report
+                )
+            except ValueError as error:
+                st.error(f"Could not score the file: {error}")
+            else:
+                progress.progress(1.0, text="Done")
+
+                st.subheader("Species counts")
+                st.bar_chart(species_counts)
+
+                st.subheader("Prediction probability histograms")
+                st.bar_chart(histograms)
+
+                with open(output_path, "rb") as file:
+                    st.download_button(
+                        "Download predictions",
+                        file,
+                        file_name="penguin_predictions.csv",
+                        mime="text/csv",
+                    )
@@ -1,9 +1,158 @@
-# so this module is created so we dont have to build the app over and over again
-import pandas as pd
-
-# loading penguins dataset from directory
-penguins = pd.read_csv("penguins_cleaned.csv")
-
-print(penguins.head())
-print("Hello")
-
+# so this module is created so we dont have to build the app over and over again
+# training pipeline: encodes the data, runs a cross validated hyperparameter search over the
+# random forest on every core, then refits the best one and saves it with its metrics
+# every (params, fold) score is cached on disk, so an interrupted search resumes where it stopped
+# run with: python model_building.py            (python model_building.py --help for options)
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import time
+
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold
+
+from encoding import build_schema, encode, save_schema
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(HERE, ".search_cache")
+
+# hyperparameters tried by the search, every combination is scored on every fold
+PARAM_GRID = {
+    "n_estimators": [100, 300],
+    "max_depth": [None, 5, 10],
+    "max_features": ["sqrt", None],
+    "min_samples_leaf": [1, 2, 4],
+}
+
+# encoding target
+target_mapper = {"Adelie": 0, "Chinstrap": 1, "Gentoo": 2}
+
+
+def load_data(path):
+    # loading penguins dataset from directory
+    penguins = pd.read_csv(path)
+    schema = build_schema(penguins)
+    X = encode(penguins, schema)
+    Y = penguins["species"].map(target_mapper)
+    return X, Y, schema
+
+
+def job_key(data_hash, params, fold, folds, seed):
+    # everything that changes a fold's score goes into its cache key
+    text = json.dumps([data_hash, params, fold, folds, seed], sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()[:24]
+
+
+def score_fold(X, Y, params, train_index, test_index, seed, cache_path):
+    if os.path.exists(cache_path):
+        with open(cache_path) as file:
+            return json.load(file)
+
+    started = time.perf_counter()
+    # one core per fit, the parallelism comes from running many fits at once
+    clf = RandomForestClassifier(**params, random_state=seed, n_jobs=1)
+    clf.fit(X.iloc[train_index], Y.iloc[train_index])
+    result = {
+        "accuracy": float(clf.score(X.iloc[test_index], Y.iloc[test_index])),
+        "seconds": time.perf_counter() - started,
+    }
+
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(result, file)
+    os.replace(tmp_path, cache_path)
+    return result
+
+
+def search(X, Y, folds, seed, jobs):
+    # returns one row per (params, fold) with its accuracy
+    rows_hash = pd.util.hash_pandas_object(pd.concat([X, Y], axis=1), index=False)
+    data_hash = hashlib.sha256(rows_hash.to_numpy().tobytes()).hexdigest()
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed).split(X, Y))
+    grid = [dict(zip(PARAM_GRID, values)) for values in itertools.product(*PARAM_GRID.values())]
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tasks = []
+    for params, (fold, (train_index, test_index)) in itertools.product(grid, enumerate(splits)):
+        cache_path = os.path.join(CACHE_DIR, f"{job_key(data_hash, params, fold, folds, seed)}.json")
+        tasks.append((params, fold, train_index, test_index, cache_path))
+
+    cached = sum(os.path.exists(task[-1]) for task in tasks)
+    print(f"{len(grid)} candidates x {folds} folds = {len(tasks)} fits, {cached} already cached")
+
+    results = Parallel(n_jobs=jobs, verbose=5)(
+        delayed(score_fold)(X, Y, params, train_index, test_index, seed, cache_path)
+        for params, _, train_index, test_index, cache_path in tasks
+    )
+    return [
+        {"params": params, "fold": fold, **result}
+        for (params, fold, _, _, _), result in zip(tasks, results)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the penguin classifier")
+    parser.add_argument("--data", default=os.path.join(HERE, "penguins_cleaned.csv"))
+    parser.add_argument("--output", default=os.path.join(HERE, "penguins_clf.pkl"))
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel fits, -1 uses every core")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    X, Y, schema = load_data(args.data)
+
+    search_started = time.perf_counter()
+    rows = search(X, Y, args.folds, args.seed, args.jobs)
+    search_seconds = time.perf_counter() - search_started
+
+    # best mean accuracy over the folds
+    scores = pd.DataFrame(rows)
+    scores["candidate"] = scores["params"].map(lambda params: json.dumps(params, sort_keys=True))
+    summary = scores.groupby("candidate")["accuracy"].agg(["mean", "std"])
+    summary = summary.sort_values("mean", ascending=False)
+    best_params = json.loads(summary.index[0])
+    print(summary.head())
+
+    # refit the winner on all of the data, using every core for the trees
+    fit_started = time.perf_counter()
+    clf = RandomForestClassifier(**best_params, random_state=args.seed, n_jobs=args.jobs)
+    clf.fit(X, Y)
+    # the app predicts one row at a time, so the saved model shouldnt start a thread pool per call
+    clf.set_params(n_jobs=None)
+    fit_seconds = time.perf_counter() - fit_started
+
+    # saves the model (temp file + rename, so the app never loads half a pickle), the encoder
+    # and the metrics next to each other
+    with open(f"{args.output}.tmp", "wb") as file:
+        pickle.dump(clf, file)
+    os.replace(f"{args.output}.tmp", args.output)
+    save_schema(schema, os.path.join(os.path.dirname(args.output), "penguins_encoder.json"))
+
+    metrics = {
+        "best_params": best_params,
+        "cv_accuracy_mean": float(summary["mean"].iloc[0]),
+        "cv_accuracy_std": float(summary["std"].iloc[0]),
+        "folds": args.folds,
+        "candidates": len(summary),
+        "rows": len(X),
+        "seconds": {
+            "search": search_seconds,
+            "refit": fit_seconds,
+            "total": time.perf_counter() - started,
+        },
+    }
+    metrics_path = os.path.splitext(args.output)[0] + "_metrics.json"
+    with open(metrics_path, "w") as file:
+        json.dump(metrics, file, indent=2)
+
+    print(json.dumps(metrics, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# check and benchmark: keyset paging through aqi_data with pager.py
+# a throwaway database where some readings have no date (or no city) is walked page by page to
+# the last page, for every sort and direction, and must give every row exactly once, in the same
+# order as one plain ORDER BY query
+# run with: python bench_pager.py --rows 100000 --page-size 500
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import queries
+from pager import SORT_KEYS, Pager
+
+
+def build_database(path, n_rows, rng):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE aqi_data (id INTEGER PRIMARY KEY AUTOINCREMENT, city TEXT, date TEXT, aqi INTEGER)"
+    )
+    dates = pd.date_range("2023-01-01", periods=365).strftime("%Y-%m-%d").to_numpy()
+    rows = [
+        (
+            None if rng.random() < 0.02 else f"City {rng.integers(5)}",
+            # about one reading in ten has no date
+            None if rng.random() < 0.1 else str(rng.choice(dates)),
+            int(rng.integers(20, 250)),
+        )
+        for _ in range(n_rows)
+    ]
+    conn.executemany("INSERT INTO aqi_data (city, date, aqi) VALUES (?, ?, ?)", rows)
+    conn.commit()
+    queries.ensure_indexes(conn)
+    return conn
+
+
+def expected_ids(conn, city, sort, descending):
+    direction = " DESC" if descending else ""
+    sql = "SELECT id FROM aqi_data"
+    params = []
+    if city is not None:
+        sql += " WHERE city = ?"
+        params.append(city)
+    sql += " ORDER BY " + ", ".join(key + direction for key in SORT_KEYS[sort])
+    return [row[0] for row in conn.execute(sql, params)]
+
+
+def walk(pager, page_size, city, sort, descending):
+    # ids of every page from the first to the last, and how many pages that took
+    ids, pages, key = [], 0, None
+    while True:
+        page, key = pager.page(key, page_size, city, sort, descending)
+        ids.extend(page["id"].tolist())
+        pages += 1
+        if key is None:
+            return ids, pages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and benchmark keyset paging")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        conn = build_database(path, args.rows, np.random.default_rng(0))
+        pager = Pager(path)
+        for city in [None, "City 0"]:
+            for sort in SORT_KEYS:
+                for descending in [False, True]:
+                    started = time.perf_counter()
+                    ids, pages = walk(pager, args.page_size, city, sort, descending)
+                    seconds = time.perf_counter() - started
+
+                    name = f"{city or 'all cities'}, by {sort}{' desc' if descending else ''}"
+                    assert ids == expected_ids(conn, city, sort, descending), f"{name}: rows differ"
+                    print(f"{name:<28}{len(ids):>8,} rows in {pages:>4} pages, {seconds / pages * 1000:.2f} ms a page")
+        pager.conn.close()
+        conn.close()
+    print("every walk reached the last page with every row once")
@@ -0,0 +1,78 @@
+# benchmark: full table read + pandas filter/pivot vs the indexed queries and rollups in queries.py
+# builds a throwaway database of fake hourly readings and times both ways of answering
+# "daily means for one city" and "daily means for every city"
+# run with: python bench_queries.py --cities 200 --days 730
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import queries
+import rollups
+
+
+def build_database(path, n_cities, n_days, readings_per_day):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE aqi_data (id INTEGER PRIMARY KEY AUTOINCREMENT, city TEXT, date TEXT, aqi INTEGER)"
+    )
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2023-01-01", periods=n_days).strftime("%Y-%m-%d")
+    for city in range(n_cities):
+        rows = [
+            (f"City {city:03d}", date, int(aqi))
+            for date in dates
+            for aqi in rng.integers(20, 250, readings_per_day)
+        ]
+        conn.executemany("INSERT INTO aqi_data (city, date, aqi) VALUES (?, ?, ?)", rows)
+    conn.commit()
+    return conn
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def full_table_city(conn, city):
+    df = pd.read_sql("SELECT * FROM aqi_data", conn)
+    return df[df["city"] == city].groupby("date")["aqi"].mean()
+
+
+def full_table_pivot(conn):
+    df = pd.read_sql("SELECT * FROM aqi_data", conn)
+    return df.pivot_table(index="date", columns="city", values="aqi", aggfunc="mean")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark aqi queries")
+    parser.add_argument("--cities", type=int, default=100)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--per-day", type=int, default=24, help="readings per city per day")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        conn = build_database(os.path.join(directory, "bench.db"), args.cities, args.days, args.per_day)
+        rows = conn.execute("SELECT COUNT(*) FROM aqi_data").fetchone()[0]
+        city = "City 000"
+
+        before_city = timed(lambda: full_table_city(conn, city))
+        before_all = timed(lambda: full_table_pivot(conn))
+
+        queries.ensure_indexes(conn)
+        rollups.ensure_rollups(conn)
+        after_city = timed(lambda: queries.city_mean(conn, city))
+        after_all = timed(lambda: queries.mean_by_city(conn))
+        conn.close()
+
+    print(f"{rows:,} readings, {args.cities} cities")
+    print(f"one city:   full table {before_city:.3f}s, indexed {after_city:.3f}s ({before_city / after_city:.0f}x)")
+    print(f"all cities: full table {before_all:.3f}s, indexed {after_all:.3f}s ({before_all / after_all:.1f}x)")
@@ -0,0 +1,143 @@
+# bulk loader for the aqi database
+# readings are streamed from csv or json lines files in batches and inserted with executemany
+# inside large transactions, with sqlite tuned for loading (wal, no fsync per commit, big cache)
+# the indexes and rollup triggers are dropped during the load; the indexes are built once at the
+# end and the new rows are folded into the rollups with one grouped query, which is much faster
+# than updating them row by row
+# run with: python ingest.py readings.csv more_readings.jsonl --db nafas.db
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import time
+from itertools import islice
+
+import queries
+import rollups
+
+BATCH_ROWS = 50_000
+
+# rows per transaction, a commit every few million rows keeps the wal file from growing forever
+TRANSACTION_ROWS = 2_000_000
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS aqi_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        city TEXT,
+        date TEXT,
+        aqi INTEGER
+    )
+"""
+
+INSERT = "INSERT INTO aqi_data (city, date, aqi) VALUES (?, ?, ?)"
+
+# aqi values that mean "no reading", stored as NULL
+MISSING = {"", "na", "n/a", "nan", "null", "none"}
+
+
+def create_table(conn):
+    conn.execute(CREATE_TABLE)
+    conn.commit()
+
+
+def parse_aqi(value):
+    # None for a missing reading, the whole number otherwise (csv gives text, json numbers)
+    if value is None or (isinstance(value, str) and value.strip().lower() in MISSING):
+        return None
+    aqi = float(value)
+    if aqi != aqi:
+        return None
+    return int(aqi)
+
+
+def read_rows(path):
+    # yields (city, date, aqi) tuples from a .csv file with a header, or a .jsonl/.ndjson file
+    # with one {"city": ..., "date": ..., "aqi": ...} object per line
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline="", encoding="utf-8") as file:
+        if extension == ".csv":
+            for record in csv.DictReader(file):
+                yield record["city"], record["date"], parse_aqi(record["aqi"])
+        elif extension in (".jsonl", ".ndjson"):
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record["city"], record["date"], parse_aqi(record.get("aqi"))
+        else:
+            raise ValueError(f"unsupported file type {extension}, use .csv or .jsonl")
+
+
+def bulk_load(conn, rows, batch_rows=BATCH_ROWS, transaction_rows=TRANSACTION_ROWS):
+    # inserts every (city, date, aqi) tuple from rows, returns (rows inserted, seconds)
+    # conn has to be in autocommit mode (sqlite3.connect(..., isolation_level=None)): the load
+    # runs its own BEGIN/COMMIT, which the sqlite3 module's implicit transactions would break
+    if conn.isolation_level is not None:
+        raise ValueError("bulk_load needs a connection opened with isolation_level=None")
+    started = time.perf_counter()
+
+    # loading settings: wal, no fsync until the end, 256 MB page cache, temp tables in memory
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+    create_table(conn)
+    rollups.ensure_rollups(conn)
+    first_new_id = rollups.last_id(conn)
+    rollups.drop_triggers(conn)
+    for name in queries.INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+    total = 0
+    in_transaction = 0
+    rows = iter(rows)
+    try:
+        conn.execute("BEGIN")
+        while True:
+            batch = list(islice(rows, batch_rows))
+            if not batch:
+                break
+            conn.executemany(INSERT, batch)
+            total += len(batch)
+            in_transaction += len(batch)
+            if in_transaction >= transaction_rows:
+                conn.execute("COMMIT")
+                conn.execute("BEGIN")
+                in_transaction = 0
+        conn.execute("COMMIT")
+    finally:
+        # a failed load (a bad row, ctrl-c) keeps the transactions already committed and only
+        # loses the open one, so the indexes, the rollups and their triggers are restored either
+        # way: otherwise the app scans the whole table, and ensure_rollups (which only fills
+        # tables it creates) would never add the committed rows to the summaries
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        queries.ensure_indexes(conn)
+        conn.execute("BEGIN")
+        rollups.fold_in(conn, first_new_id)
+        rollups.create_triggers(conn)
+        conn.execute("COMMIT")
+
+    # back to safe settings for normal use
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("ANALYZE")
+    return total, time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load aqi readings into sqlite")
+    parser.add_argument("files", nargs="+", help=".csv or .jsonl files with city, date, aqi")
+    parser.add_argument("--db", default="nafas.db")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    args = parser.parse_args()
+
+    def all_rows():
+        for path in args.files:
+            yield from read_rows(path)
+
+    # isolation_level=None: transactions are started and committed by bulk_load itself
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    rows, seconds = bulk_load(conn, all_rows(), batch_rows=args.batch_rows)
+    conn.close()
+    print(f"{rows:,} rows in {seconds:.1f}s ({rows / max(seconds, 1e-9):,.0f} rows/s)")
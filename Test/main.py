@@ -1,9 +1,18 @@
 import streamlit as st
 import sqlite3
-import pandas as pd
 import random
 from datetime import datetime, timedelta
 import os
+import sys
+
+# the shared helpers live in common/ at the repo root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.charts import line_chart
+
+import queries
+import rollups
+from pager import Pager
+from ingest import INSERT, create_table
 
 # Streamlit Title
 st.title("AQI Data Viewer")
@@ -13,105 +22,122 @@ db_path = "nafas.db"
 
 
 # Function to create and populate the database if it doesn't exist
-def create_dummy_database():
-    # Connect to the database (creates if it doesn't exist)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
+# real historical data should be loaded with ingest.py, which is built for millions of rows
+def create_dummy_database(conn):
     # Create table
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS aqi_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            city TEXT,
-            date TEXT,
-            aqi INTEGER
-        )
-        """
-    )
-
-    # Check if data already exists
-    cursor.execute("SELECT COUNT(*) FROM aqi_data")
-    count = cursor.fetchone()[0]
+    create_table(conn)
 
     # Generate dummy data only if table is empty
-    if count == 0:
+    if not has_data(conn):
         cities = ["Kuala Lumpur", "Penang", "Johor", "Selangor", "Sarawak"]
         start_date = datetime(2025, 3, 1)
 
+        rows = []
         for _ in range(10):
             city = random.choice(cities)
             date = (start_date + timedelta(days=random.randint(0, 30))).strftime(
                 "%Y-%m-%d"
             )
             aqi = random.randint(50, 200)  # Fake AQI values
-            cursor.execute(
-                "INSERT INTO aqi_data (city, date, aqi) VALUES (?, ?, ?)",
-                (city, date, aqi),
-            )
+            rows.append((city, date, aqi))
 
+        # all rows in one statement and one transaction
+        conn.executemany(INSERT, rows)
         conn.commit()
         st.success("Dummy database created successfully!")
 
-    conn.close()
 
+def has_data(conn):
+    # stops at the first row, unlike COUNT(*) which reads the whole table
+    return conn.execute("SELECT EXISTS (SELECT 1 FROM aqi_data)").fetchone()[0] == 1
 
-# Check if the database exists, if not create it
+
+# Check if the database exists, if not create it (one connection for all the checks)
 db_exists = os.path.exists(db_path)
+setup_conn = sqlite3.connect(db_path)
 if not db_exists:
     st.warning("Database not found. Creating a new one with dummy data.")
-    create_dummy_database()
+    create_dummy_database(setup_conn)
 else:
     # Check if the table exists and has data
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM aqi_data")
-        count = cursor.fetchone()[0]
-        conn.close()
-
-        if count == 0:
+        if not has_data(setup_conn):
             st.warning("Database exists but has no data. Adding dummy data.")
-            create_dummy_database()
+            create_dummy_database(setup_conn)
     except sqlite3.OperationalError:
         st.warning(
             "Database exists but table doesn't. Creating table and adding dummy data."
         )
-        create_dummy_database()
+        create_dummy_database(setup_conn)
+setup_conn.close()
+
+
+# one connection per process, reused by every rerun, indexes and rollups are created the first time
+@st.cache_resource
+def get_connection():
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    queries.ensure_indexes(conn)
+    rollups.ensure_rollups(conn)
+    return conn
+
+
+# keyset paginated reader for the data grid, shared by every session
+@st.cache_resource
+def get_pager():
+    return Pager(db_path)
+
+
+def data_grid(conn):
+    # shows one page of aqi_data at a time, the page keys visited so far are kept in the session
+    # so "Previous" can go back without any OFFSET queries
+    col1, col2, col3, col4 = st.columns(4)
+    grid_city = col1.selectbox("City", ["All"] + queries.cities(conn), key="grid_city")
+    sort = col2.selectbox("Sort by", ["id", "date"], key="grid_sort")
+    page_size = col3.selectbox("Rows per page", [25, 50, 100, 500], index=1, key="grid_page_size")
+    descending = col4.checkbox("Descending", key="grid_descending")
+
+    # a different filter or sort starts again from the first page
+    query = (grid_city, sort, page_size, descending)
+    if st.session_state.get("grid_query") != query:
+        st.session_state["grid_query"] = query
+        st.session_state["grid_keys"] = [None]
+    keys = st.session_state["grid_keys"]
+
+    page, next_key = get_pager().page(
+        keys[-1], page_size, None if grid_city == "All" else grid_city, sort, descending
+    )
+    st.dataframe(page, hide_index=True)
 
-try:
-    # Connect to the SQLite database
-    conn = sqlite3.connect(db_path)
+    col1, col2, col3 = st.columns([1, 1, 4])
+    col1.button("Previous", disabled=len(keys) == 1, on_click=keys.pop)
+    col2.button("Next", disabled=next_key is None, on_click=keys.append, args=(next_key,))
+    col3.write(f"Page {len(keys)}")
 
-    # Read data into a Pandas DataFrame
-    df = pd.read_sql("SELECT * FROM aqi_data", conn)
 
-    # Close connection
-    conn.close()
+try:
+    # Connect to the SQLite database
+    conn = get_connection()
 
-    # Display DataFrame in Streamlit
+    # Display the table one page at a time
     st.subheader("All AQI Data")
-    st.dataframe(df)
+    data_grid(conn)
 
-    # Add a filter by city
-    city_filter = st.selectbox("Filter by City:", ["All"] + list(df["city"].unique()))
+    # Add a filter by city, the list comes from the index instead of the table
+    city_filter = st.selectbox("Filter by City:", ["All"] + queries.cities(conn))
 
-    if city_filter != "All":
-        filtered_df = df[df["city"] == city_filter]
-        st.subheader(f"Filtered Data for {city_filter}")
-        st.dataframe(filtered_df)
+    # charts read the daily or monthly rollup tables, never the raw readings
+    resolution = st.radio("Chart resolution", ["daily", "monthly"], horizontal=True)
 
-        # Add a simple visualization
+    if city_filter != "All":
+        # the city's readings are in the grid above (filtered by city there), only its chart is here
         st.subheader(f"AQI Levels for {city_filter}")
-        chart_df = filtered_df[["date", "aqi"]].set_index("date")
-        st.line_chart(chart_df)
+        chart_df = queries.city_mean(conn, city_filter, resolution)
+        line_chart(chart_df)
     else:
         # Show chart for all cities
         st.subheader("AQI Levels by City")
-        pivot_df = df.pivot_table(
-            index="date", columns="city", values="aqi", aggfunc="mean"
-        )
-        st.line_chart(pivot_df)
+        pivot_df = queries.mean_by_city(conn, resolution)
+        line_chart(pivot_df)
 
 except Exception as e:
     st.error(f"An error occurred: {str(e)}")
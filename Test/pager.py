@@ -0,0 +1,98 @@
+# keyset pagination over aqi_data
+# a page is "the next N rows after this key" (WHERE key > ? ORDER BY key LIMIT ?), which an
+# index answers directly no matter how deep into the table the page is, unlike OFFSET
+# only the visible page is loaded, and the page after it is fetched in the background
+# rows with a NULL date are paged too: sqlite sorts NULL first ascending and last descending
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+COLUMNS = ["id", "city", "date", "aqi"]
+
+# sort option -> columns of the keyset, id last so the key is always unique
+SORT_KEYS = {"id": ["id"], "date": ["date", "id"]}
+
+# prefetched pages kept around (for every session together)
+PREFETCH_PAGES = 32
+
+
+def _after(keys, after, descending):
+    # where clause and params for the rows that come after the key in ORDER BY order
+    # a row value comparison with a NULL is never true, so a NULL date (id is never NULL) is
+    # handled on its own
+    operator = "<" if descending else ">"
+    if len(keys) == 1:
+        return f"{keys[0]} {operator} ?", [after[0]]
+
+    column, tie = keys
+    value, tie_value = after
+    if value is None:
+        # still inside the NULL group, ascending every non NULL row comes after it too
+        sql = f"({column} IS NULL AND {tie} {operator} ?)"
+        if not descending:
+            sql = f"({sql} OR {column} IS NOT NULL)"
+        return sql, [tie_value]
+    # row value comparison, (date, id) > (?, ?) walks the index in order
+    sql = f"({column}, {tie}) {operator} (?, ?)"
+    if descending:
+        # descending the NULL group is still to come
+        sql = f"({sql} OR {column} IS NULL)"
+    return sql, [value, tie_value]
+
+
+class Pager:
+    def __init__(self, db_path):
+        # one connection for every page, shared by the app and the prefetch thread under a lock
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.prefetched = OrderedDict()
+
+    def _query(self, after, page_size, city, sort, descending):
+        keys = SORT_KEYS[sort]
+        where, params = [], []
+        if city is not None:
+            where.append("city = ?")
+            params.append(city)
+        if after is not None:
+            sql, after_params = _after(keys, after, descending)
+            where.append(sql)
+            params.extend(after_params)
+
+        direction = " DESC" if descending else ""
+        sql = f"SELECT {', '.join(COLUMNS)} FROM aqi_data"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY " + ", ".join(key + direction for key in keys) + " LIMIT ?"
+        # one extra row tells whether there is a next page
+        params.append(page_size + 1)
+
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+
+        next_key = None
+        if len(rows) > page_size:
+            last = rows[page_size - 1]
+            next_key = tuple(last[COLUMNS.index(key)] for key in keys)
+        return pd.DataFrame(rows[:page_size], columns=COLUMNS), next_key
+
+    def page(self, after, page_size, city=None, sort="id", descending=False):
+        # returns the page as a dataframe and the key of the next page (None on the last page)
+        request = (after, page_size, city, sort, descending)
+        with self.lock:
+            future = self.prefetched.pop(request, None)
+        result = future.result() if future is not None else self._query(*request)
+
+        # start loading the page after this one while the user looks at this one
+        next_key = result[1]
+        if next_key is not None:
+            upcoming = (next_key, page_size, city, sort, descending)
+            with self.lock:
+                if upcoming not in self.prefetched:
+                    self.prefetched[upcoming] = self.pool.submit(self._query, *upcoming)
+                    while len(self.prefetched) > PREFETCH_PAGES:
+                        self.prefetched.popitem(last=False)
+        return result
@@ -0,0 +1,57 @@
+# query layer for the aqi database
+# filtering happens in sqlite with an index on (city, date) and the chart means come from the
+# rollup tables, so the app only pulls the rows a table or chart actually shows instead of the
+# whole aqi_data table
+import pandas as pd
+
+# index name -> indexed columns
+# every index ends in the rowid (id), so the data grid's keyset pages walk one of them in order:
+# (city) for one city sorted by id, (city, date) for one city sorted by date and for the per city
+# reads, (date) for every city sorted by date (sorting everything by id uses the table itself)
+# nothing goes after date, or (date, id) wouldnt be the index order anymore
+INDEXES = {
+    "idx_aqi_city": ("city",),
+    "idx_aqi_city_date": ("city", "date"),
+    "idx_aqi_date": ("date",),
+}
+
+
+def ensure_indexes(conn):
+    for name, columns in INDEXES.items():
+        # databases made by older versions can have an index of the same name on other columns
+        existing = tuple(row[2] for row in conn.execute(f"PRAGMA index_info({name})"))
+        if existing and existing != columns:
+            conn.execute(f"DROP INDEX {name}")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON aqi_data ({', '.join(columns)})")
+    conn.commit()
+
+
+# chart resolution -> rollup table kept up to date by rollups.py
+ROLLUP_TABLES = {"daily": "aqi_daily", "monthly": "aqi_monthly"}
+
+
+def cities(conn):
+    # the monthly rollup has a handful of rows per city, much smaller than the raw table
+    return [row[0] for row in conn.execute("SELECT DISTINCT city FROM aqi_monthly ORDER BY city")]
+
+
+def city_mean(conn, city, resolution="daily"):
+    # one mean per day (or month) for one city, indexed by the period
+    table = ROLLUP_TABLES[resolution]
+    return pd.read_sql(
+        f"SELECT period AS date, 1.0 * aqi_sum / aqi_count AS aqi FROM {table} "
+        "WHERE city = ? ORDER BY period",
+        conn,
+        params=(city,),
+        index_col="date",
+    )
+
+
+def mean_by_city(conn, resolution="daily"):
+    # mean aqi per day or month (rows) and city (columns), same shape as the old pivot_table
+    table = ROLLUP_TABLES[resolution]
+    means = pd.read_sql(
+        f"SELECT period AS date, city, 1.0 * aqi_sum / aqi_count AS aqi FROM {table}",
+        conn,
+    )
+    return means.pivot(index="date", columns="city", values="aqi").sort_index()
@@ -0,0 +1,132 @@
+# daily and monthly aqi summaries per city (sum, count, min, max of the readings)
+# triggers keep them up to date as readings are inserted, deleted or changed, so the charts read
+# one row per city and day (or month) instead of averaging every raw reading on each rerun
+# bulk loads switch the triggers off and fold the new rows in with one grouped query at the end
+# readings without a city or date have no summary row to go to and are left out (aqi_data
+# allows them, the summary keys dont)
+
+# rollup table -> the expression that gives its period from aqi_data.date (YYYY-MM-DD)
+PERIODS = {
+    "aqi_daily": "date",
+    "aqi_monthly": "substr(date, 1, 7)",
+}
+
+# rollup table -> the readings of one summary row as a condition on date, written as a range so
+# it is a range of the (city, date) index ({date} is the date of the changed reading)
+PERIOD_RANGES = {
+    "aqi_daily": "date = {date}",
+    "aqi_monthly": (
+        "date >= substr({date}, 1, 7) || '-01' "
+        "AND date < date(substr({date}, 1, 7) || '-01', '+1 month')"
+    ),
+}
+
+TRIGGERS = ["aqi_rollup_insert", "aqi_rollup_delete", "aqi_rollup_update"]
+
+# how an existing summary row absorbs new readings
+MERGE = """
+    ON CONFLICT (city, period) DO UPDATE SET
+        aqi_sum = aqi_sum + excluded.aqi_sum,
+        aqi_count = aqi_count + excluded.aqi_count,
+        aqi_min = MIN(aqi_min, excluded.aqi_min),
+        aqi_max = MAX(aqi_max, excluded.aqi_max)
+"""
+
+
+def _create_table(table):
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            city TEXT NOT NULL,
+            period TEXT NOT NULL,
+            aqi_sum INTEGER NOT NULL,
+            aqi_count INTEGER NOT NULL,
+            aqi_min INTEGER NOT NULL,
+            aqi_max INTEGER NOT NULL,
+            PRIMARY KEY (city, period)
+        ) WITHOUT ROWID
+    """
+
+
+def _add_row(table, row):
+    # adds one reading (NEW) to its summary row
+    period = PERIODS[table].replace("date", f"{row}.date")
+    return f"""
+        INSERT INTO {table} (city, period, aqi_sum, aqi_count, aqi_min, aqi_max)
+        SELECT {row}.city, {period}, {row}.aqi, 1, {row}.aqi, {row}.aqi
+        WHERE {row}.aqi IS NOT NULL AND {row}.city IS NOT NULL AND {row}.date IS NOT NULL
+        {MERGE};
+    """
+
+
+def _recompute(table, row):
+    # min/max cant be undone incrementally, so the one affected summary row is rebuilt from the
+    # raw readings of that city and period (a small range of the (city, date) index)
+    period = PERIODS[table]
+    row_period = period.replace("date", f"{row}.date")
+    in_period = PERIOD_RANGES[table].format(date=f"{row}.date")
+    return f"""
+        DELETE FROM {table} WHERE city = {row}.city AND period = {row_period};
+        INSERT INTO {table} (city, period, aqi_sum, aqi_count, aqi_min, aqi_max)
+        SELECT city, {period}, SUM(aqi), COUNT(aqi), MIN(aqi), MAX(aqi)
+        FROM aqi_data
+        WHERE city = {row}.city AND {in_period} AND aqi IS NOT NULL
+        GROUP BY city, {period};
+    """
+
+
+def _create_triggers():
+    insert = "".join(_add_row(table, "NEW") for table in PERIODS)
+    delete = "".join(_recompute(table, "OLD") for table in PERIODS)
+    update = "".join(_recompute(table, "OLD") + _recompute(table, "NEW") for table in PERIODS)
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS aqi_rollup_insert AFTER INSERT ON aqi_data BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS aqi_rollup_delete AFTER DELETE ON aqi_data BEGIN {delete} END",
+        "CREATE TRIGGER IF NOT EXISTS aqi_rollup_update AFTER UPDATE OF city, date, aqi ON aqi_data "
+        f"BEGIN {update} END",
+    ]
+
+
+def fold_in(conn, after_id=0):
+    # adds every reading with id > after_id to the summaries in one grouped query per table
+    for table, period in PERIODS.items():
+        conn.execute(
+            f"""
+            INSERT INTO {table} (city, period, aqi_sum, aqi_count, aqi_min, aqi_max)
+            SELECT city, {period}, SUM(aqi), COUNT(aqi), MIN(aqi), MAX(aqi)
+            FROM aqi_data
+            WHERE id > ? AND aqi IS NOT NULL AND city IS NOT NULL AND date IS NOT NULL
+            GROUP BY city, {period}
+            {MERGE}
+            """,
+            (after_id,),
+        )
+
+
+def create_triggers(conn):
+    for statement in _create_triggers():
+        conn.execute(statement)
+
+
+def drop_triggers(conn):
+    for name in TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def ensure_rollups(conn):
+    # creates the summary tables and triggers, and fills the tables from the existing readings
+    # the first time (a database made before the rollups existed)
+    existing = {
+        row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    }
+    for table in PERIODS:
+        conn.execute(_create_table(table))
+    if not all(table in existing for table in PERIODS):
+        for table in PERIODS:
+            conn.execute(f"DELETE FROM {table}")
+        fold_in(conn)
+    create_triggers(conn)
+    conn.commit()
+
+
+def last_id(conn):
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM aqi_data").fetchone()[0]
@@ -0,0 +1,44 @@
+# benchmark: chart downsampling, and a check that every chart stays within its point budget
+# random walks of different lengths and series counts (up to far more series than the budget
+# gives a bucket each) are downsampled, the points sent must never exceed max_points
+# run from the repo root with: python -m common.bench_downsample --max-points 2000
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from common.downsample import downsample, downsample_frame, points
+
+# (rows, series) shapes checked
+SHAPES = [(10_000, 1), (100_000, 1), (2_400, 200), (50_000, 50), (5_000, 600), (1_000, 3_000)]
+
+
+def random_walks(rows, series, rng):
+    values = rng.standard_normal((rows, series)).cumsum(axis=0)
+    # a shuffled x axis, which downsampling has to sort first
+    index = pd.Index(rng.permutation(rows), name="x")
+    return pd.DataFrame(values, index=index, columns=[f"s{i}" for i in range(series)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and benchmark chart downsampling")
+    parser.add_argument("--max-points", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for rows, series in SHAPES:
+        frame = random_walks(rows, series, rng)
+        started = time.perf_counter()
+        if series == 1:
+            result, dropped = downsample(frame.iloc[:, 0], args.max_points)
+            assert result.index.is_monotonic_increasing, "x axis not sorted"
+        else:
+            result, dropped = downsample_frame(frame, args.max_points)
+        seconds = time.perf_counter() - started
+
+        sent = len(result)
+        assert sent <= args.max_points, f"{rows} x {series}: {sent} points sent, budget {args.max_points}"
+        assert sent + dropped == points(frame), f"{rows} x {series}: points dont add up"
+        print(f"{rows:>7,} rows x {series:>5} series: {sent:>5,} points sent in {seconds * 1000:.1f} ms")
+    print(f"every chart within {args.max_points:,} points")
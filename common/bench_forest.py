@@ -0,0 +1,68 @@
+# benchmark: sklearn predict_proba vs CompiledForest, single rows and batches
+# also checks that rows with missing values (nan) get the same probabilities as sklearn
+# run from the repo root with: python -m common.bench_forest
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn import datasets
+from sklearn.ensemble import RandomForestClassifier
+
+from common.forest import CompiledForest
+
+
+def best_of(fn, repeat):
+    # fastest run, the least disturbed by everything else on the machine
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark compiled forest inference")
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--batch", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    iris = datasets.load_iris(as_frame=True)
+    clf = RandomForestClassifier(n_estimators=args.trees, random_state=0).fit(iris.data, iris.target)
+    compiled = CompiledForest(clf)
+
+    # random rows inside the range of the training data
+    rng = np.random.default_rng(0)
+    low, high = iris.data.min().to_numpy(), iris.data.max().to_numpy()
+    batch = pd.DataFrame(rng.uniform(low, high, (args.batch, len(low))), columns=iris.data.columns)
+    row = batch.iloc[:1]
+
+    expected = clf.predict_proba(batch)
+    got = compiled.predict_proba(batch)
+    print(f"max abs difference vs sklearn: {np.abs(expected - got).max():.2e}")
+    print(f"same predicted class: {np.array_equal(clf.predict(batch), compiled.predict(batch))}")
+
+    # missing values, for a forest trained without them and one trained with them
+    if compiled.supports_nan:
+        holes = batch.mask(rng.random(batch.shape) < 0.2)
+        train = iris.data.mask(rng.random(iris.data.shape) < 0.1)
+        clf_nan = RandomForestClassifier(n_estimators=args.trees, random_state=0).fit(train, iris.target)
+        for name, model in [("trained without nan", clf), ("trained with nan", clf_nan)]:
+            expected = model.predict_proba(holes)
+            difference = np.abs(expected - CompiledForest(model).predict_proba(holes)).max()
+            assert difference < 1e-9, f"{name}: rows with nan differ from sklearn by {difference:.2e}"
+            print(f"{name}: max abs difference on rows with nan {difference:.2e}")
+    else:
+        print("this sklearn version has no missing value support, nan check skipped")
+
+    sk_row = best_of(lambda: clf.predict_proba(row), args.repeat)
+    cf_row = best_of(lambda: compiled.predict_proba(row), args.repeat)
+    sk_batch = best_of(lambda: clf.predict_proba(batch), 3)
+    cf_batch = best_of(lambda: compiled.predict_proba(batch), 3)
+
+    print(f"single row: sklearn {sk_row * 1e3:.3f} ms, compiled {cf_row * 1e3:.3f} ms ({sk_row / cf_row:.1f}x)")
+    print(
+        f"{args.batch:,} rows: sklearn {sk_batch:.3f} s, compiled {cf_batch:.3f} s ({sk_batch / cf_batch:.1f}x)"
+    )
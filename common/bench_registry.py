@@ -0,0 +1,99 @@
+# benchmark: unpickling a forest in every process vs memory mapped arrays from the registry
+# measures load time and the memory of several worker processes holding the same model
+# RSS counts shared pages in full for every process, PSS splits them between the processes
+# sharing them, so PSS is what shows the saving (linux only, it reads /proc)
+# run from the repo root with: python -m common.bench_registry --workers 4
+import argparse
+import multiprocessing
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from common.forest import CompiledForest
+from common.registry import ModelRegistry
+
+
+def memory_kb():
+    # (rss, pss) of this process in kB
+    values = {}
+    with open("/proc/self/smaps_rollup") as file:
+        for line in file:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:"):
+                values[parts[0]] = int(parts[1])
+    return values["Rss:"], values["Pss:"]
+
+
+def worker(mode, model_path, cache_dir, ready, done, results):
+    started = time.perf_counter()
+    if mode == "pickle":
+        with open(model_path, "rb") as file:
+            model = CompiledForest(pickle.load(file))
+    else:
+        model = ModelRegistry(cache_dir).get(model_path)
+    load_time = time.perf_counter() - started
+
+    # touch every node array so all pages are really in memory
+    for name in ("feature", "threshold", "left", "right", "value"):
+        np.asarray(getattr(model, name)).sum()
+
+    # wait until every worker has loaded, so the pss split is measured while they all share
+    ready.wait()
+    results.put((load_time, *memory_kb()))
+    done.wait()
+
+
+def run(mode, model_path, cache_dir, workers):
+    context = multiprocessing.get_context("spawn")
+    ready = context.Barrier(workers + 1)
+    done = context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(mode, model_path, cache_dir, ready, done, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    ready.wait()
+    measured = [results.get() for _ in processes]
+    done.set()
+    for process in processes:
+        process.join()
+    return measured
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark model loading and shared memory")
+    parser.add_argument("--model", help="pickled RandomForestClassifier, a synthetic one by default")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--trees", type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        model_path = args.model
+        if model_path is None:
+            # big enough forest that the tree arrays dominate the process memory
+            rng = np.random.default_rng(0)
+            X = rng.standard_normal((50_000, 10))
+            Y = (X[:, 0] + rng.standard_normal(len(X)) > 0).astype(int)
+            clf = RandomForestClassifier(n_estimators=args.trees, random_state=0, n_jobs=-1).fit(X, Y)
+            model_path = os.path.join(directory, "model.pkl")
+            with open(model_path, "wb") as file:
+                pickle.dump(clf, file)
+
+        cache_dir = os.path.join(directory, "cache")
+        # compile once up front, like the first process to start would
+        ModelRegistry(cache_dir).get(model_path)
+
+        print(f"model file: {os.path.getsize(model_path) / 1024**2:.1f} MB, {args.workers} workers")
+        for mode in ("pickle", "mmap"):
+            measured = np.array(run(mode, model_path, cache_dir, args.workers))
+            load, rss, pss = measured.mean(axis=0)
+            print(
+                f"{mode:>6}: load {load * 1e3:8.1f} ms, RSS {rss / 1024:7.1f} MB, "
+                f"PSS {pss / 1024:7.1f} MB per worker (total PSS {measured[:, 2].sum() / 1024:.1f} MB)"
+            )
@@ -0,0 +1,38 @@
+# streamlit chart helpers shared by the dashboards
+import pandas as pd
+import streamlit as st
+
+from common.downsample import (
+    MAX_POINTS,
+    SERIES,
+    VALUE,
+    downsample,
+    downsample_frame,
+    points,
+    sort_x,
+)
+
+
+def line_chart(data, max_points=None):
+    # same as st.line_chart, but big series are downsampled on the server first
+    # frames with several series over the budget are drawn from the long form, one line per series
+    if max_points is None:
+        max_points = MAX_POINTS
+
+    if isinstance(data, pd.DataFrame) and len(data.columns) == 1:
+        data = data.iloc[:, 0]
+    total = points(data)
+    if isinstance(data, pd.Series):
+        chart_data, dropped = downsample(data, max_points)
+        st.line_chart(chart_data)
+    elif total <= max_points:
+        chart_data, dropped = sort_x(data), 0
+        st.line_chart(chart_data)
+    else:
+        chart_data, dropped = downsample_frame(data, max_points)
+        x = chart_data.columns[0]
+        st.line_chart(chart_data, x=x, y=VALUE, color=SERIES)
+
+    if dropped:
+        st.caption(f"Showing {total - dropped:,} of {total:,} points ({dropped:,} dropped, peaks kept)")
+    return dropped
@@ -0,0 +1,78 @@
+# helpers for processing big files chunk by chunk
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+def map_chunks(fn, chunks, workers=1, initializer=None, initargs=()):
+    # yields fn(chunk) for every chunk, in order
+    # with workers > 1 the chunks run on a process pool, but at most two chunks per worker are
+    # in flight at a time, so a fast reader never piles up chunks in memory
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for chunk in chunks:
+            yield fn(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        pending = []
+        for chunk in chunks:
+            pending.append(pool.submit(fn, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def score_csv_chunks(
+    source, output, fn, workers=1, chunk_rows=100_000, initializer=None, initargs=(), progress=None
+):
+    # reads the csv source in chunks, runs fn on each one (see map_chunks) and writes the scored
+    # frame fn returns first to the csv output, yielding fn's whole result so the caller can
+    # keep its own running totals, memory stays bounded by a few chunks
+    # source is a path or an open binary file (like a streamlit upload), output a path
+    # progress(rows done, fraction of the input read) is called after every chunk
+    if isinstance(source, (str, os.PathLike)):
+        handle = open(source, "rb")
+        size = os.path.getsize(source)
+    else:
+        handle = source
+        handle.seek(0, os.SEEK_END)
+        size = handle.tell()
+        handle.seek(0)
+
+    rows = 0
+    try:
+        chunks = pd.read_csv(handle, chunksize=chunk_rows)
+        with open(output, "w", newline="") as file:
+            for i, result in enumerate(map_chunks(fn, chunks, workers, initializer, initargs)):
+                scored = result[0]
+                scored.to_csv(file, header=i == 0, index=False)
+                rows += len(scored)
+                if progress is not None:
+                    # pandas reads ahead, so the file position is a close enough estimate
+                    progress(rows, min(handle.tell() / size, 1.0) if size else 1.0)
+                yield result
+    finally:
+        if handle is not source:
+            handle.close()
+        else:
+            # leave an upload ready to be read again
+            source.seek(0)
+
+
+@contextmanager
+def scratch_file(prefix, suffix=".csv"):
+    # a path in the temp directory that is removed again when the block ends, for results that
+    # are written to disk and then handed to a download button
+    path = os.path.join(tempfile.gettempdir(), f"{prefix}_{os.getpid()}_{time.time_ns()}{suffix}")
+    try:
+        yield path
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,121 @@
+# server side downsampling for line charts, shared by the dashboards
+# streamlit sends every point to the browser, so big series are cut down here first
+# min/max bucketing: the series is split into equal buckets and only the lowest and highest
+# point of each bucket is kept, which keeps every peak and dip visible on the chart
+# the budget counts points (rows x series), and every series of a frame is bucketed on its own
+import os
+
+import numpy as np
+import pandas as pd
+
+# how many points a chart may send, can be changed per app or with the CHART_MAX_POINTS env var
+MAX_POINTS = int(os.environ.get("CHART_MAX_POINTS", 2000))
+
+# column names of the long form frame downsample_frame returns
+SERIES = "series"
+VALUE = "value"
+
+# fewest points a series is bucketed into (its two ends plus one bucket's min and max), frames with
+# more series than the budget gives this many are drawn as min/mean/max across the series instead
+MIN_SHARE = 4
+
+
+def _minmax_positions(values, buckets):
+    # positions of the min and max of each bucket, all buckets get the same size
+    n = len(values)
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = values
+    rows = padded.reshape(buckets, size)
+
+    # nan never wins, an all nan bucket just points at its first slot
+    lows = np.where(np.isnan(rows), np.inf, rows).argmin(axis=1)
+    highs = np.where(np.isnan(rows), -np.inf, rows).argmax(axis=1)
+
+    offsets = np.arange(buckets) * size
+    positions = np.concatenate((offsets + lows, offsets + highs, [0, n - 1]))
+    return np.unique(positions[positions < n])
+
+
+def sort_x(data):
+    # buckets are taken by position, so they only follow the x axis if the index is sorted
+    if data.index.is_monotonic_increasing:
+        return data
+    try:
+        return data.sort_index(kind="stable")
+    except TypeError:
+        # mixed types on the x axis, the chart cant order them either
+        return data
+
+
+def numeric_columns(frame):
+    return [c for c in frame.columns if pd.api.types.is_numeric_dtype(frame[c])]
+
+
+def points(data):
+    # how many points a line chart of data draws
+    if isinstance(data, pd.Series):
+        return len(data)
+    return len(data) * max(len(numeric_columns(data)), 1)
+
+
+def _positions(series, max_points):
+    # at most max_points positions
+    if not pd.api.types.is_numeric_dtype(series) or max_points < MIN_SHARE:
+        # nothing to find peaks in (or no room for a bucket), just take evenly spaced rows
+        return np.unique(np.linspace(0, len(series) - 1, max_points).astype(np.int64))
+    # two points per bucket, the two ends are part of the budget too
+    buckets = (max_points - 2) // 2
+    return _minmax_positions(series.to_numpy(dtype=np.float64, na_value=np.nan), buckets)
+
+
+def downsample(series, max_points=None):
+    # series is indexed by the x axis
+    # returns the reduced series, sorted by x, and how many points were dropped
+    if max_points is None:
+        max_points = MAX_POINTS
+
+    series = sort_x(series)
+    n = len(series)
+    if n <= max_points:
+        return series, 0
+    positions = _positions(series, max_points)
+    return series.iloc[positions], n - len(positions)
+
+
+def downsample_frame(frame, max_points=None):
+    # frame is indexed by the x axis with one numeric column per series
+    # every series gets an equal share of the budget and is bucketed on its own, so one wide frame
+    # cant hold the result: it comes back in long form (x, SERIES, VALUE), plus the points dropped
+    if max_points is None:
+        max_points = MAX_POINTS
+
+    frame = sort_x(frame)
+    columns = numeric_columns(frame)
+    x = frame.index.name or "index"
+    if len(columns) > 3 and len(columns) * MIN_SHARE > max_points:
+        # too many series for each to get a bucket, draw the spread across them instead
+        values = frame[columns]
+        spread = pd.DataFrame(
+            {
+                f"min of {len(columns)} series": values.min(axis=1),
+                f"mean of {len(columns)} series": values.mean(axis=1),
+                f"max of {len(columns)} series": values.max(axis=1),
+            },
+            index=frame.index,
+        )
+        long, _ = downsample_frame(spread, max_points)
+        return long, max(points(frame) - len(long), 0)
+
+    # every series stays within its share, so the whole chart stays within max_points
+    share = max_points // max(len(columns), 1)
+    parts = []
+    for column in columns:
+        reduced, _ = downsample(frame[column].dropna(), share)
+        parts.append(
+            pd.DataFrame({x: reduced.index, SERIES: str(column), VALUE: reduced.to_numpy()})
+        )
+    if not parts:
+        return pd.DataFrame(columns=[x, SERIES, VALUE]), 0
+    long = pd.concat(parts, ignore_index=True)
+    return long, max(points(frame) - len(long), 0)
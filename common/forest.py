@@ -0,0 +1,128 @@
+# array based inference for a trained sklearn RandomForestClassifier
+# every tree is flattened into one set of contiguous numpy arrays (feature, threshold, children,
+# leaf probabilities), and all trees are walked together with vectorised numpy steps
+# for one row this skips sklearn's per call validation and thread pool, which is most of its cost
+# missing values (nan) follow the side sklearn learned for each node, like its own predict
+import json
+import os
+
+import numpy as np
+
+# bumped whenever the saved arrays change, so older compiled directories are never loaded
+FORMAT = 2
+
+
+class CompiledForest:
+    def __init__(self, forest):
+        # plain (non object) array, so it can be saved and memory mapped with the rest
+        self.classes_ = np.asarray(forest.classes_.tolist())
+        self.feature_names = getattr(forest, "feature_names_in_", None)
+
+        features, thresholds, lefts, rights, missing, values, roots = [], [], [], [], [], [], []
+        # sklearn before 1.3 has no missing value support, and its predict rejects nan
+        self.supports_nan = all(
+            hasattr(estimator.tree_, "missing_go_to_left") for estimator in forest.estimators_
+        )
+        depth = 0
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left == -1
+
+            # leaves point at themselves, so extra steps past a leaf keep the row where it is
+            lefts.append(np.where(leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(leaf, nodes, tree.children_right) + offset)
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            if self.supports_nan:
+                missing.append(np.asarray(tree.missing_go_to_left, dtype=bool))
+            else:
+                missing.append(np.zeros(tree.node_count, dtype=bool))
+
+            # leaf probabilities, normalised the same way DecisionTreeClassifier.predict_proba does
+            value = tree.value[:, 0, :].astype(np.float64)
+            totals = value.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1
+            values.append(value / totals)
+
+            roots.append(offset)
+            depth = max(depth, tree.max_depth)
+            offset += tree.node_count
+
+        self.feature = np.concatenate(features).astype(np.intp)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(lefts).astype(np.intp)
+        self.right = np.concatenate(rights).astype(np.intp)
+        self.missing_left = np.concatenate(missing)
+        self.value = np.concatenate(values)
+        self.roots = np.array(roots, dtype=np.intp)
+        self.depth = depth
+
+    def _prepare(self, X):
+        # dataframes are put in training column order, sklearn compares float32 features
+        if self.feature_names is not None and hasattr(X, "columns"):
+            X = X[list(self.feature_names)]
+        X = np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+        if not self.supports_nan and np.isnan(X).any():
+            raise ValueError("Input X contains NaN, this sklearn version has no missing value support")
+        return X
+
+    def _leaves(self, X):
+        # (rows, trees) array with the leaf every row ends up in for every tree
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        # nan compares false, so without this every missing value would go right
+        has_nan = np.isnan(X).any()
+        for _ in range(self.depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = x <= self.threshold[nodes]
+            if has_nan:
+                go_left = np.where(np.isnan(x), self.missing_left[nodes], go_left)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X, batch_size=4096):
+        X = self._prepare(X)
+        proba = np.empty((len(X), len(self.classes_)))
+        # batches keep the (rows, trees, classes) temporary small
+        for start in range(0, len(X), batch_size):
+            batch = X[start : start + batch_size]
+            proba[start : start + len(batch)] = self.value[self._leaves(batch)].sum(axis=1)
+        proba /= len(self.roots)
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    # arrays saved as plain .npy files, so they can be memory mapped and shared between processes
+    ARRAYS = ("feature", "threshold", "left", "right", "missing_left", "value", "roots", "classes_")
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        meta = {
+            "format": FORMAT,
+            "depth": int(self.depth),
+            "supports_nan": bool(self.supports_nan),
+            "feature_names": None if self.feature_names is None else list(self.feature_names),
+        }
+        with open(os.path.join(directory, "meta.json"), "w") as file:
+            json.dump(meta, file)
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        # with mmap_mode="r" the node arrays are read from the page cache, not copied in
+        forest = cls.__new__(cls)
+        with open(os.path.join(directory, "meta.json")) as file:
+            meta = json.load(file)
+        if meta.get("format") != FORMAT:
+            raise ValueError(f"{directory} is format {meta.get('format')}, this version reads {FORMAT}")
+        for name in cls.ARRAYS:
+            setattr(forest, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode))
+        forest.depth = meta["depth"]
+        forest.supports_nan = meta["supports_nan"]
+        names = meta["feature_names"]
+        forest.feature_names = None if names is None else np.array(names, dtype=object)
+        return forest
@@ -0,0 +1,75 @@
+# process wide model registry
+# every pickled forest is loaded once per process and compiled into CompiledForest arrays, which
+# are saved as .npy files named after the pickle's hash and memory mapped from there, so all
+# worker processes serving the same model share the same pages instead of each holding a copy
+# a model is only reloaded when its file's contents change
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+
+from common.forest import FORMAT, CompiledForest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(ROOT, ".cache", "models")
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024**2), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+        # path -> (mtime/size, hash, compiled forest)
+        self.models = {}
+
+    def _compiled_dir(self, digest):
+        # the format is part of the name, so a directory saved by an older version is never reused
+        return os.path.join(self.cache_dir, f"{digest[:32]}.v{FORMAT}")
+
+    def _load(self, path, digest):
+        directory = self._compiled_dir(digest)
+        if not os.path.exists(os.path.join(directory, "meta.json")):
+            with open(path, "rb") as file:
+                forest = CompiledForest(pickle.load(file))
+            # build next to the final directory and rename, so a reader never sees half of it
+            tmp_dir = f"{directory}.{os.getpid()}.tmp"
+            forest.save(tmp_dir)
+            try:
+                os.replace(tmp_dir, directory)
+            except OSError:
+                # another process got there first, theirs is just as good
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        return CompiledForest.load(directory, mmap_mode="r")
+
+    def get(self, path):
+        # cheap stat check on every call, the file is only hashed again when it looks changed
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            entry = self.models.get(path)
+            if entry is not None and entry[0] == key:
+                return entry[2]
+
+            digest = file_hash(path)
+            if entry is not None and entry[1] == digest:
+                # touched but not changed
+                self.models[path] = (key, digest, entry[2])
+                return entry[2]
+
+            forest = self._load(path, digest)
+            self.models[path] = (key, digest, forest)
+            return forest
+
+
+# the one registry every app in this process uses
+registry = ModelRegistry()
@@ -0,0 +1,239 @@
+# split artifact format for the aqi model bundle
+# instead of one pickle holding the prophet model and the whole history dataframe, a directory:
+#   manifest.json               format version, library versions, last_date and a sha256 per file
+#   model.json                  the prophet model (prophet.serialize, not tied to pickle internals)
+#   history.arrow               historical_data as an uncompressed arrow file (memory mapped)
+#   target_month_avg_temps.json the (month, day) -> temperature table
+#   climatology.json            the 366 day temperature table the page needs before any forecast
+# ModelBundle reads only the manifest when it opens, every other part is loaded (and its hash
+# checked) the first time it is used
+# the manifest also records the pickle the bundle was made from, so a retrained pickle is noticed
+# convert the pickle with: python artifact.py prophet_aqi_model.pkl prophet_aqi_model
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from collections.abc import MutableMapping
+
+import numpy as np
+import pandas as pd
+
+from climatology import Climatology
+
+FORMAT = 1
+
+MANIFEST = "manifest.json"
+
+FILES = {
+    "model": "model.json",
+    "historical_data": "history.arrow",
+    "target_month_avg_temps": "target_month_avg_temps.json",
+    "climatology": "climatology.json",
+}
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_temps(path, temps):
+    # a series indexed by (month, day)
+    with open(path, "w") as file:
+        json.dump(
+            {
+                "names": list(temps.index.names),
+                "index": [list(map(int, key)) for key in temps.index],
+                "values": [None if pd.isna(value) else float(value) for value in temps],
+            },
+            file,
+        )
+
+
+def _read_temps(path):
+    with open(path) as file:
+        data = json.load(file)
+    index = pd.MultiIndex.from_tuples([tuple(key) for key in data["index"]], names=data["names"])
+    return pd.Series(data["values"], index=index, dtype="float64")
+
+
+def _write_climatology(path, climatology):
+    # json has no nan, missing values are written as null
+    arrays = [
+        [None if np.isnan(value) else float(value) for value in values]
+        for values in climatology.to_arrays()
+    ]
+    with open(path, "w") as file:
+        json.dump(arrays, file)
+
+
+def _read_climatology(path):
+    with open(path) as file:
+        day_means, fill_values = json.load(file)
+    # nulls come back as None, which float arrays turn into nan
+    return Climatology.from_arrays(
+        np.array(day_means, dtype=np.float64), np.array(fill_values, dtype=np.float64)
+    )
+
+
+def source_stamp(path):
+    # identifies the pickle a bundle was made from
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_hash(path)}
+
+
+def made_from(directory, path):
+    # whether the bundle in directory was exported from the pickle at path as it is now
+    # size and mtime are checked first, the pickle is only hashed if they changed (a copy or a
+    # checkout touches the mtime without changing the model)
+    with open(os.path.join(directory, MANIFEST)) as file:
+        source = json.load(file).get("source")
+    if source is None:
+        return False
+    stat = os.stat(path)
+    if stat.st_size == source["size"] and stat.st_mtime_ns == source["mtime_ns"]:
+        return True
+    return stat.st_size == source["size"] and file_hash(path) == source["sha256"]
+
+
+def export(model_data, directory, source=None):
+    # writes the bundle into directory (replacing it), built in a temporary directory first so a
+    # half written bundle is never picked up, source is the pickle model_data was loaded from
+    import prophet
+    from prophet.serialize import model_to_json
+
+    parent = os.path.dirname(os.path.abspath(directory))
+    staging = tempfile.mkdtemp(dir=parent, prefix=".bundle-")
+    try:
+        with open(os.path.join(staging, FILES["model"]), "w") as file:
+            file.write(model_to_json(model_data["model"]))
+        history = model_data["historical_data"].reset_index(drop=True)
+        history.to_feather(os.path.join(staging, FILES["historical_data"]), compression="uncompressed")
+        _write_temps(
+            os.path.join(staging, FILES["target_month_avg_temps"]),
+            model_data["target_month_avg_temps"],
+        )
+        _write_climatology(
+            os.path.join(staging, FILES["climatology"]),
+            Climatology(history, model_data["target_month_avg_temps"]),
+        )
+
+        manifest = {
+            "format": FORMAT,
+            "prophet": prophet.__version__,
+            "pandas": pd.__version__,
+            "last_date": pd.Timestamp(model_data["last_date"]).isoformat(),
+            "files": {
+                name: {"path": path, "sha256": file_hash(os.path.join(staging, path))}
+                for name, path in FILES.items()
+            },
+        }
+        if source is not None:
+            manifest["source"] = source_stamp(source)
+        with open(os.path.join(staging, MANIFEST), "w") as file:
+            json.dump(manifest, file, indent=2)
+
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.replace(staging, directory)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+class ModelBundle(MutableMapping):
+    # the same keys as the pickled dict (model, last_date, historical_data,
+    # target_month_avg_temps, climatology), each loaded on first access, other keys can be set as
+    # usual, safe to use from several threads (a part is loaded once)
+    def __init__(self, directory, verify=True):
+        self.directory = directory
+        self.verify = verify
+        with open(os.path.join(directory, MANIFEST)) as file:
+            self.manifest = json.load(file)
+        if self.manifest["format"] != FORMAT:
+            raise ValueError(
+                f"{directory} is format {self.manifest['format']}, this version reads {FORMAT}"
+            )
+        self.values = {"last_date": pd.Timestamp(self.manifest["last_date"])}
+        self.loaders = {
+            "model": self._load_model,
+            "historical_data": self._load_history,
+            "target_month_avg_temps": self._load_temps,
+            "climatology": self._load_climatology,
+        }
+        self.lock = threading.RLock()
+
+    @property
+    def version(self):
+        # identifies the model, changes whenever any part of the bundle changes
+        hashes = "".join(entry["sha256"] for entry in self.manifest["files"].values())
+        return hashlib.sha256(hashes.encode()).hexdigest()[:16]
+
+    def _path(self, name):
+        entry = self.manifest["files"][name]
+        path = os.path.join(self.directory, entry["path"])
+        if self.verify and file_hash(path) != entry["sha256"]:
+            raise ValueError(f"{path} does not match the hash in the manifest")
+        return path
+
+    def _load_model(self):
+        from prophet.serialize import model_from_json
+
+        with open(self._path("model")) as file:
+            return model_from_json(file.read())
+
+    def _load_history(self):
+        import pyarrow.feather
+
+        # memory mapped, the columns are read from the page cache instead of parsed
+        return pyarrow.feather.read_table(self._path("historical_data"), memory_map=True).to_pandas()
+
+    def _load_temps(self):
+        return _read_temps(self._path("target_month_avg_temps"))
+
+    def _load_climatology(self):
+        return _read_climatology(self._path("climatology"))
+
+    def __getitem__(self, key):
+        if key not in self.values and key in self.loaders:
+            with self.lock:
+                if key not in self.values:
+                    self.values[key] = self.loaders[key]()
+        return self.values[key]
+
+    def __setitem__(self, key, value):
+        self.values[key] = value
+
+    def __delitem__(self, key):
+        del self.values[key]
+
+    def __iter__(self):
+        return iter(dict.fromkeys([*self.loaders, *self.values]))
+
+    def __len__(self):
+        return len(set(self.loaders) | set(self.values))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a pickled aqi model bundle")
+    parser.add_argument("source", help="pickle with model, last_date, historical_data, ...")
+    parser.add_argument("directory", help="bundle directory to write")
+    args = parser.parse_args()
+
+    with open(args.source, "rb") as file:
+        model_data = pickle.load(file)
+    export(model_data, args.directory, source=args.source)
+    sizes = {
+        path: os.path.getsize(os.path.join(args.directory, path))
+        for path in [MANIFEST, *FILES.values()]
+    }
+    for path, size in sizes.items():
+        print(f"{path}: {size:,} bytes")
+    print(f"pickle: {os.path.getsize(args.source):,} bytes")
@@ -0,0 +1,147 @@
+# batch aqi forecasts for many stations
+# every *.pkl in a directory is one station's model bundle (same format as prophet_aqi_model.pkl:
+# model, last_date, historical_data, target_month_avg_temps), the stations are forecast on a
+# process pool and the daily forecasts go to one parquet file or an sqlite table
+# run from this folder with: python batch_forecast.py models/ forecasts.parquet --workers 8
+#   (--start/--end pick the date range, by default the year after each station's history)
+import argparse
+import os
+import pickle
+import sqlite3
+import sys
+import time
+
+import pandas as pd
+
+# the shared helpers live in common/ at the repo root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.chunks import map_chunks
+
+from climatology import Climatology
+from forecasting import OUTPUT_COLUMNS, ForecastService
+
+DAYS = 365
+
+SQLITE_TABLE = "aqi_forecast"
+
+
+def forecast_station(task):
+    # runs in a worker: loads one bundle and forecasts every day from start to end
+    # returns (station, forecast, seconds spent loading, seconds spent predicting)
+    path, start, end, days = task
+    station = os.path.splitext(os.path.basename(path))[0]
+    started = time.perf_counter()
+    with open(path, "rb") as file:
+        model_data = pickle.load(file)
+    historical_data = model_data["historical_data"]
+    climatology = Climatology(historical_data, model_data["target_month_avg_temps"])
+    service = ForecastService(model_data["model"], historical_data, climatology, station)
+    loaded = time.perf_counter()
+
+    if start is None:
+        start = pd.Timestamp(model_data["last_date"]) + pd.Timedelta(days=1)
+    if end is None:
+        end = pd.Timestamp(start) + pd.Timedelta(days=days - 1)
+    dates = pd.date_range(start, end, freq="D")
+    # recorded temperatures inside the history, each day's historical average after it
+    temps = service.temperatures(dates, None, None, climatology.averages(dates))
+    forecast = model_data["model"].predict(pd.DataFrame({"ds": dates, "temperature": temps}))
+
+    forecast = forecast[["ds"] + OUTPUT_COLUMNS].reset_index(drop=True)
+    forecast.insert(0, "station", station)
+    forecast["temperature"] = temps
+    return station, forecast, loaded - started, time.perf_counter() - loaded
+
+
+def model_paths(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".pkl")
+    )
+
+
+def write_sqlite(path, forecasts):
+    # replaces earlier forecasts of the same stations, one transaction per station
+    conn = sqlite3.connect(path)
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {SQLITE_TABLE} (
+            station TEXT NOT NULL,
+            ds TEXT NOT NULL,
+            yhat REAL,
+            yhat_lower REAL,
+            yhat_upper REAL,
+            temperature REAL,
+            PRIMARY KEY (station, ds)
+        )
+        """
+    )
+    try:
+        for forecast in forecasts:
+            rows = forecast.assign(ds=forecast["ds"].dt.strftime("%Y-%m-%d"))
+            with conn:
+                station = rows["station"].iloc[0]
+                conn.execute(f"DELETE FROM {SQLITE_TABLE} WHERE station = ?", (station,))
+                conn.executemany(
+                    f"INSERT INTO {SQLITE_TABLE} VALUES (?, ?, ?, ?, ?, ?)",
+                    rows[["station", "ds"] + OUTPUT_COLUMNS + ["temperature"]].itertuples(
+                        index=False, name=None
+                    ),
+                )
+    finally:
+        conn.close()
+
+
+def forecast_directory(directory, output, start=None, end=None, days=DAYS, workers=1, progress=None):
+    # forecasts every station in directory and writes them to output (.parquet, else sqlite)
+    # progress(station, rows, load seconds, predict seconds) is called as each one finishes
+    # returns a dataframe of per station timings
+    paths = model_paths(directory)
+    if not paths:
+        raise FileNotFoundError(f"no .pkl model bundles in {directory}")
+    tasks = [(path, start, end, days) for path in paths]
+
+    timings = []
+
+    def finished():
+        for station, forecast, load_seconds, predict_seconds in map_chunks(
+            forecast_station, tasks, workers
+        ):
+            timings.append((station, len(forecast), load_seconds, predict_seconds))
+            if progress is not None:
+                progress(station, len(forecast), load_seconds, predict_seconds)
+            yield forecast
+
+    if output.endswith(".parquet"):
+        pd.concat(finished(), ignore_index=True).to_parquet(output, index=False)
+    else:
+        write_sqlite(output, finished())
+
+    timings = pd.DataFrame(timings, columns=["station", "days", "load_s", "predict_s"])
+    timings["days_per_s"] = timings["days"] / (timings["load_s"] + timings["predict_s"])
+    return timings.set_index("station")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Forecast aqi for every station model in a directory")
+    parser.add_argument("models", help="directory of model bundles (*.pkl)")
+    parser.add_argument("output", help="a .parquet file, anything else is an sqlite database")
+    parser.add_argument("--start", type=pd.Timestamp, help="first day (default: after the history)")
+    parser.add_argument("--end", type=pd.Timestamp, help="last day (default: start + --days - 1)")
+    parser.add_argument("--days", type=int, default=DAYS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    def report(station, rows, load_seconds, predict_seconds):
+        print(f"{station}: {rows:,} days, load {load_seconds:.2f}s, predict {predict_seconds:.2f}s")
+
+    started = time.perf_counter()
+    timings = forecast_directory(
+        args.models, args.output, args.start, args.end, args.days, args.workers, progress=report
+    )
+    seconds = time.perf_counter() - started
+    print()
+    print(timings.to_string(float_format=lambda value: f"{value:.2f}"))
+    print(
+        f"{len(timings)} stations, {timings['days'].sum():,} days in {seconds:.1f}s "
+        f"({len(timings) / seconds:.2f} stations/s, {timings['days'].sum() / seconds:,.0f} days/s)"
+    )
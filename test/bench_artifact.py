@@ -0,0 +1,90 @@
+# benchmark: startup of the pickled model bundle vs the split artifact from artifact.py
+# every measurement runs in a fresh python process (imports included), like a cold app start,
+# converting the pickle into a temporary bundle first if --bundle isnt given
+# run from this folder with: python bench_artifact.py --repeat 5
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# what each way of starting up does, {path} is filled in
+# the pickle has to be loaded whole, and main.py builds the climatology from it before the page shows
+PICKLE = """
+import pickle
+from climatology import Climatology
+with open({path!r}, "rb") as file:
+    model_data = pickle.load(file)
+Climatology(model_data["historical_data"], model_data["target_month_avg_temps"])
+"""
+
+BUNDLE_OPEN = """
+from artifact import ModelBundle
+model_data = ModelBundle({path!r})
+model_data["last_date"]
+"""
+
+# what main.py needs before the page shows, the model and history load in the background
+BUNDLE_PAGE = BUNDLE_OPEN + """
+model_data["climatology"]
+"""
+
+BUNDLE_HISTORY = BUNDLE_PAGE + """
+model_data["historical_data"], model_data["target_month_avg_temps"]
+"""
+
+BUNDLE_FULL = BUNDLE_HISTORY + """
+model_data["model"]
+"""
+
+BUNDLE_UNVERIFIED = BUNDLE_FULL.replace("ModelBundle({path!r})", "ModelBundle({path!r}, verify=False)")
+
+
+def cold_start(code, path, repeat):
+    # best wall time of a fresh interpreter running code
+    here = os.path.dirname(os.path.abspath(__file__))
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code.format(path=path)], cwd=here, check=True)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark aqi model startup")
+    parser.add_argument("--pickle", default="prophet_aqi_model.pkl")
+    parser.add_argument("--bundle", help="existing bundle directory (default: convert the pickle)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    pickle_path = os.path.abspath(args.pickle)
+
+    with tempfile.TemporaryDirectory() as directory:
+        bundle = args.bundle
+        if bundle is None:
+            bundle = os.path.join(directory, "bundle")
+            subprocess.run(
+                [sys.executable, "artifact.py", pickle_path, bundle],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+        bundle = os.path.abspath(bundle)
+
+        before = cold_start(PICKLE, pickle_path, args.repeat)
+        results = {
+            "bundle, manifest only": cold_start(BUNDLE_OPEN, bundle, args.repeat),
+            "bundle, page shown": cold_start(BUNDLE_PAGE, bundle, args.repeat),
+            "bundle, + history": cold_start(BUNDLE_HISTORY, bundle, args.repeat),
+            "bundle, + model": cold_start(BUNDLE_FULL, bundle, args.repeat),
+            "bundle, unverified": cold_start(BUNDLE_UNVERIFIED, bundle, args.repeat),
+        }
+        size = sum(
+            os.path.getsize(os.path.join(bundle, name)) for name in os.listdir(bundle)
+        )
+
+    print(f"pickle {os.path.getsize(pickle_path):,} bytes, bundle {size:,} bytes")
+    print(f"{'pickle':<24}{before:.3f}s")
+    for name, seconds in results.items():
+        print(f"{name:<24}{seconds:.3f}s ({before / seconds:.1f}x)")
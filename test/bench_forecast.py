@@ -0,0 +1,90 @@
+# benchmark: the old full-history predict (make_future_dataframe over every day since the start
+# of the history) vs ForecastService, which predicts only the week shown and caches it
+# run from this folder with: python bench_forecast.py --days-ahead 30
+import argparse
+import pickle
+import time
+
+import pandas as pd
+
+from climatology import Climatology
+from forecasting import ForecastGrid, ForecastService
+
+
+def full_predict(model_data, climatology, target_date, temperature, default):
+    # what main.py did before, for the same target date and temperature
+    model = model_data["model"]
+    historical_data = model_data["historical_data"]
+    days_needed = (target_date - historical_data["ds"].max()).days
+    future = model.make_future_dataframe(periods=days_needed + 1, freq="D")
+    future = future.merge(historical_data[["ds", "temperature"]], on="ds", how="left")
+    future.loc[future["ds"] == target_date, "temperature"] = temperature
+    future["temperature"] = climatology.fill(future["ds"], future["temperature"], default)
+    return model.predict(future)
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark aqi forecasting")
+    parser.add_argument("--model", default="prophet_aqi_model.pkl")
+    parser.add_argument("--days-ahead", type=int, default=30, help="target date after the history")
+    parser.add_argument("--temperature", type=float, default=30.0)
+    args = parser.parse_args()
+
+    with open(args.model, "rb") as file:
+        model_data = pickle.load(file)
+    historical_data = model_data["historical_data"]
+    climatology = Climatology(historical_data, model_data["target_month_avg_temps"])
+    target_date = historical_data["ds"].max() + pd.Timedelta(days=args.days_ahead)
+    default = climatology.average(target_date)
+    start = target_date - pd.Timedelta(days=3)
+    end = target_date + pd.Timedelta(days=3)
+
+    full = timed(lambda: full_predict(model_data, climatology, target_date, args.temperature, default))
+
+    def cold():
+        service = ForecastService(model_data["model"], historical_data, climatology, "bench")
+        return service.forecast(start, end, target_date, args.temperature, default)
+
+    cold_seconds = timed(cold)
+    service = ForecastService(model_data["model"], historical_data, climatology, "bench")
+    service.forecast(start, end, target_date, args.temperature, default)
+    warm = timed(lambda: service.forecast(start, end, target_date, args.temperature, default))
+
+    started = time.perf_counter()
+    grid = ForecastGrid(service, historical_data["ds"].max() - pd.Timedelta(days=2), 365 + 6)
+    if grid.coefficient is None:
+        raise SystemExit("temperature is not an additive regressor, the grid is not used")
+    grid.done.wait()
+    if grid.error is not None:
+        raise grid.error
+    grid_build = time.perf_counter() - started
+    # a what-if temperature different from the default, applied through the coefficient
+    what_if = args.temperature + 2.0
+    lookup = timed(lambda: grid.window(start, end, target_date, what_if))
+
+    # these should agree on the target date (prophet samples the intervals, so only yhat)
+    before = full_predict(model_data, climatology, target_date, args.temperature, default)
+    after, _ = service.forecast(start, end, target_date, args.temperature, default)
+    yhat_before = before.loc[before["ds"] == target_date, "yhat"].iloc[0]
+    yhat_after = after.loc[after["ds"] == target_date, "yhat"].iloc[0]
+    shifted, _ = grid.window(start, end, target_date, what_if)
+    predicted, _ = service.forecast(start, end, target_date, what_if, default)
+    yhat_shifted = shifted.loc[shifted["ds"] == target_date, "yhat"].iloc[0]
+    yhat_predicted = predicted.loc[predicted["ds"] == target_date, "yhat"].iloc[0]
+
+    print(f"{len(historical_data):,} history rows, target {target_date.date()}")
+    print(f"full history predict: {full:.3f}s")
+    print(f"service, cold cache:  {cold_seconds:.3f}s ({full / cold_seconds:.0f}x)")
+    print(f"service, warm cache:  {warm * 1000:.2f}ms ({full / warm:.0f}x)")
+    print(f"grid build (once):    {grid_build:.3f}s, lookup {lookup * 1000:.2f}ms ({full / lookup:.0f}x)")
+    print(f"yhat on target date: {yhat_before:.2f} vs {yhat_after:.2f}")
+    print(f"what-if {what_if:.1f}C: grid {yhat_shifted:.2f} vs predict {yhat_predicted:.2f}")
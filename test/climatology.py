@@ -0,0 +1,77 @@
+# temperature climatology for the aqi forecaster
+# built once when the model loads: one value per (month, day) of a leap year (366 entries),
+# with the month average standing in for days that have no history, so filling temperatures
+# for any set of dates is a single array lookup no matter how long the history is
+import numpy as np
+import pandas as pd
+
+# days before the start of each month in a leap year, so (month, day) -> 0..365
+DAYS_BEFORE_MONTH = np.cumsum([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30])
+
+# used when a whole month has no history
+DEFAULT_TEMPERATURE = 28.0
+
+
+def day_index(month, day):
+    return DAYS_BEFORE_MONTH[np.asarray(month) - 1] + np.asarray(day) - 1
+
+
+class Climatology:
+    def __init__(self, historical_data, target_month_avg_temps):
+        ds = historical_data["ds"]
+        temps = historical_data["temperature"]
+        month_means = temps.groupby(ds.dt.month).mean()
+        day_means = temps.groupby([ds.dt.month, ds.dt.day]).mean()
+
+        months = np.arange(1, 13)
+        month_of_day = np.repeat(months, np.diff(np.append(DAYS_BEFORE_MONTH, 366)))
+        # historical month average for every day of the year, nan if the month has no history
+        month_fallback = month_means.reindex(months).to_numpy()[month_of_day - 1]
+
+        # historical_data by (month, day), then month, then the default
+        # this is what the page shows as the "historical average" for a date
+        self.day_means = np.full(366, np.nan)
+        self._fill(self.day_means, day_means)
+        self.day_means = np.where(np.isnan(self.day_means), month_fallback, self.day_means)
+        self.day_means = np.where(np.isnan(self.day_means), DEFAULT_TEMPERATURE, self.day_means)
+
+        # target_month_avg_temps by (month, day), then the historical month average
+        # left nan where neither exists, those get the selected date's temperature
+        self.fill_values = np.full(366, np.nan)
+        self._fill(self.fill_values, target_month_avg_temps)
+        self.fill_values = np.where(np.isnan(self.fill_values), month_fallback, self.fill_values)
+
+    @classmethod
+    def from_arrays(cls, day_means, fill_values):
+        # rebuilds a climatology saved with to_arrays, without the history it was made from
+        climatology = cls.__new__(cls)
+        climatology.day_means = np.asarray(day_means, dtype=np.float64)
+        climatology.fill_values = np.asarray(fill_values, dtype=np.float64)
+        return climatology
+
+    def to_arrays(self):
+        return self.day_means, self.fill_values
+
+    @staticmethod
+    def _fill(values, means):
+        # means is indexed by (month, day) pairs
+        for (month, day), value in means.items():
+            if not pd.isna(value):
+                values[day_index(month, day)] = value
+
+    def average(self, date):
+        # historical average temperature for one date
+        return float(self.day_means[day_index(date.month, date.day)])
+
+    def averages(self, dates):
+        # historical average temperature for every date
+        dates = pd.DatetimeIndex(dates)
+        return self.day_means[day_index(dates.month, dates.day)]
+
+    def fill(self, dates, temperatures, default):
+        # fills the missing values of temperatures (aligned with dates) in one lookup
+        dates = pd.DatetimeIndex(dates)
+        lookup = self.fill_values[day_index(dates.month, dates.day)]
+        lookup = np.where(np.isnan(lookup), default, lookup)
+        temperatures = np.asarray(temperatures, dtype=np.float64)
+        return np.where(np.isnan(temperatures), lookup, temperatures)
@@ -0,0 +1,142 @@
+# forecasting service for the aqi app
+# only the days that are actually shown get predicted (not the whole history), and every
+# predicted day is memoised by (model version, date, temperature) in a bounded LRU cache,
+# so repeated or overlapping date windows mostly come straight from the cache
+# ForecastGrid goes further: it predicts the whole year ahead once in the background, after that
+# a window is a slice of the grid and a different temperature is an exact shift by the
+# regressor's coefficient (temperature is an additive regressor), so no predict call at all
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# predicted days kept in the cache
+CACHE_DAYS = 5000
+
+OUTPUT_COLUMNS = ["yhat", "yhat_lower", "yhat_upper"]
+
+
+class ForecastService:
+    def __init__(self, model, historical_data, climatology, version, cache_days=CACHE_DAYS):
+        self.model = model
+        self.climatology = climatology
+        self.version = version
+        self.cache_days = cache_days
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        # recorded temperature per history date, for windows that reach back into the history
+        self.history_temps = historical_data.groupby("ds")["temperature"].mean()
+
+    def temperatures(self, dates, target_date, temperature, default):
+        # recorded temperature where there is one, the chosen temperature on the target date,
+        # and the climatology for everything else (target_date None leaves every day as is)
+        temps = self.history_temps.reindex(dates).to_numpy(dtype=np.float64)
+        if target_date is not None:
+            temps[dates == target_date] = temperature
+        return self.climatology.fill(dates, temps, default)
+
+    def forecast(self, start, end, target_date, temperature, default):
+        # returns (forecast for every day in [start, end], stats about the call)
+        started = time.perf_counter()
+        dates = pd.date_range(start, end, freq="D")
+        temps = self.temperatures(dates, pd.Timestamp(target_date), temperature, default)
+        keys = [(self.version, date, round(float(temp), 4)) for date, temp in zip(dates, temps)]
+
+        rows = {}
+        with self.lock:
+            for key in keys:
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    rows[key] = self.cache[key]
+
+        missing = [i for i, key in enumerate(keys) if key not in rows]
+        if missing:
+            # one predict call for all the days the cache didnt have
+            future = pd.DataFrame({"ds": dates[missing], "temperature": temps[missing]})
+            predicted = self.model.predict(future)[OUTPUT_COLUMNS].to_numpy()
+            with self.lock:
+                for i, values in zip(missing, predicted):
+                    rows[keys[i]] = self.cache[keys[i]] = tuple(values)
+                while len(self.cache) > self.cache_days:
+                    self.cache.popitem(last=False)
+
+        forecast = pd.DataFrame([rows[key] for key in keys], columns=OUTPUT_COLUMNS)
+        forecast.insert(0, "ds", dates)
+        stats = {
+            "days": len(keys),
+            "predicted": len(missing),
+            "cached": len(keys) - len(missing),
+            "seconds": time.perf_counter() - started,
+        }
+        return forecast, stats
+
+
+def temperature_coefficient(model, name="temperature"):
+    # aqi change per degree, None if the regressor isnt additive (then a shift isnt exact)
+    if model.extra_regressors.get(name, {}).get("mode") != "additive":
+        return None
+    from prophet.utilities import regressor_coefficients
+
+    coefficients = regressor_coefficients(model).set_index("regressor")["coef"]
+    return float(coefficients[name])
+
+
+class ForecastGrid:
+    # forecast for every day from first to first + days - 1 with the default temperatures,
+    # computed by a background thread, lookups before it is ready return None
+    # done is set once the thread has finished either way, error holds what it raised
+    def __init__(self, service, first, days):
+        self.service = service
+        self.dates = pd.date_range(first, periods=days, freq="D")
+        self.coefficient = temperature_coefficient(service.model)
+        self.forecast = None
+        self.temps = None
+        self.ready = threading.Event()
+        self.done = threading.Event()
+        self.error = None
+        if self.coefficient is None:
+            self.done.set()
+        else:
+            threading.Thread(target=self._build, daemon=True).start()
+
+    def _build(self):
+        # an exception would otherwise end the thread silently and leave ready unset forever
+        try:
+            # the default for a day is its own historical average
+            defaults = self.service.climatology.averages(self.dates)
+            temps = self.service.temperatures(self.dates, None, None, defaults)
+            future = pd.DataFrame({"ds": self.dates, "temperature": temps})
+            forecast = self.service.model.predict(future)[["ds"] + OUTPUT_COLUMNS]
+            self.temps = temps
+            self.forecast = forecast.reset_index(drop=True)
+            self.ready.set()
+        except Exception as error:
+            self.error = error
+        finally:
+            self.done.set()
+
+    def window(self, start, end, target_date, temperature):
+        # same result as ForecastService.forecast, or None if the grid cant answer it (yet)
+        started = time.perf_counter()
+        if not self.ready.is_set():
+            return None
+        first = (pd.Timestamp(start) - self.dates[0]).days
+        last = (pd.Timestamp(end) - self.dates[0]).days
+        target = (pd.Timestamp(target_date) - self.dates[0]).days
+        if first < 0 or last >= len(self.dates) or not first <= target <= last:
+            return None
+
+        forecast = self.forecast.iloc[first : last + 1].reset_index(drop=True)
+        # only the target day's temperature differs from the grid, and the regressor is
+        # additive, so its prediction and both interval bounds move by the same amount
+        shift = self.coefficient * (temperature - self.temps[target])
+        forecast.loc[target - first, OUTPUT_COLUMNS] += shift
+        stats = {
+            "days": len(forecast),
+            "predicted": 0,
+            "cached": len(forecast),
+            "seconds": time.perf_counter() - started,
+        }
+        return forecast, stats
@@ -1,10 +1,15 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import pickle
 from datetime import datetime, timedelta
 import plotly.graph_objects as go
 import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from artifact import ModelBundle, made_from
+from climatology import Climatology
+from forecasting import ForecastGrid, ForecastService
 
 # Set page configuration
 st.set_page_config(page_title="AQI Forecasting App", layout="wide")
@@ -58,11 +63,34 @@ def load_model():
             "test/prophet_aqi_model.pkl",
         ]
 
-        for path in possible_paths:
-            if os.path.exists(path):
-                with open(path, "rb") as file:
-                    model_data = pickle.load(file)
+        pickle_path = next((path for path in possible_paths if os.path.exists(path)), None)
+
+        # the split bundle (python artifact.py prophet_aqi_model.pkl prophet_aqi_model) next to
+        # this file loads lazily and doesnt depend on pickle internals, so it is preferred, unless
+        # the pickle was retrained since the bundle was made from it
+        bundle_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prophet_aqi_model")
+        if os.path.exists(os.path.join(bundle_path, "manifest.json")):
+            if pickle_path is None or made_from(bundle_path, pickle_path):
+                # only the manifest is read here, see start_forecasting for the rest
+                model_data = ModelBundle(bundle_path)
+                model_data["version"] = model_data.version
                 return model_data
+            st.warning(
+                f"{pickle_path} is not the pickle the model bundle was made from (retrained?), "
+                "using the pickle. "
+                "Regenerate the bundle with: python artifact.py prophet_aqi_model.pkl prophet_aqi_model"
+            )
+
+        if pickle_path is not None:
+            with open(pickle_path, "rb") as file:
+                raw = file.read()
+            model_data = pickle.loads(raw)
+            model_data["version"] = hashlib.sha256(raw).hexdigest()[:16]
+            # (month, day) temperature table, built once here instead of on every rerun
+            model_data["climatology"] = Climatology(
+                model_data["historical_data"], model_data["target_month_avg_temps"]
+            )
+            return model_data
 
         raise FileNotFoundError(
             f"Couldn't find model file in any of the tried paths: {possible_paths}"
@@ -72,14 +100,42 @@ def load_model():
         return None
 
 
+# one worker thread for the whole process, shared by every session and model version
+@st.cache_resource
+def forecast_executor():
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="forecasting")
+
+
+@st.cache_resource
+def start_forecasting(version, _model_data):
+    # the forecaster is set up on a background thread, so the page shows up as soon as the dates
+    # and the temperature table are there, and a bundle's model and history load meanwhile
+    def build():
+        # predicts only the days shown and caches them, keyed by the model version
+        service = ForecastService(
+            _model_data["model"],
+            _model_data["historical_data"],
+            _model_data["climatology"],
+            version=version,
+        )
+        # the whole selectable year (plus the 3 days either side of the trend chart),
+        # predicted in the background, until it is ready the service answers
+        grid = ForecastGrid(service, _model_data["last_date"] - timedelta(days=2), 365 + 6)
+        return service, grid
+
+    return forecast_executor().submit(build)
+
+
 model_data = load_model()
 
 # If model is loaded successfully
 if model_data:
-    model = model_data["model"]
     last_date = model_data["last_date"]
-    historical_data = model_data["historical_data"]
-    target_month_avg_temps = model_data["target_month_avg_temps"]
+    climatology = model_data["climatology"]
+    forecasting = start_forecasting(model_data["version"], model_data)
+    if forecasting.done() and forecasting.exception() is not None:
+        # a failed build isnt kept: this run still shows its error, the next run starts over
+        start_forecasting.clear()
 
     # Display model info
     st.info(
@@ -105,25 +161,8 @@ if model_data:
     use_custom_temp = st.checkbox("Use custom temperature value")
 
     # Get historical average temperature for the selected date
-    target_month = target_date.month
-    target_day = target_date.day
-
-    # Try to find exact month/day combination in historical data
-    historical_temps = historical_data[
-        (historical_data["ds"].dt.month == target_month)
-        & (historical_data["ds"].dt.day == target_day)
-    ]["temperature"]
-
-    if len(historical_temps) > 0:
-        avg_temp = historical_temps.mean()
-    else:
-        # Fallback to month average if specific day not found
-        monthly_temps = historical_data[historical_data["ds"].dt.month == target_month][
-            "temperature"
-        ]
-        avg_temp = (
-            monthly_temps.mean() if len(monthly_temps) > 0 else 28.0
-        )  # Default if no data
+    # (month/day average, falling back to the month average, then 28.0 if there is no data)
+    avg_temp = climatology.average(target_date)
 
     if use_custom_temp:
         temperature = st.number_input(
@@ -142,47 +181,35 @@ if model_data:
     # Prediction button
     if st.button("Generate Prediction"):
         with st.spinner("Generating forecast..."):
+            # waits for the model if it is still loading
+            try:
+                service, grid = forecasting.result()
+            except Exception as e:
+                st.error(f"Error loading model: {e}")
+                st.stop()
+
             # Convert to pandas datetime
             pd_target_date = pd.to_datetime(target_date)
 
-            # Calculate days needed for forecast
-            days_needed = (pd_target_date - last_date).days
-
-            # Create future dataframe
-            future = model.make_future_dataframe(periods=days_needed + 1, freq="D")
-
-            # Add temperature data
-            future = future.merge(
-                historical_data[["ds", "temperature"]], on="ds", how="left"
-            )
-
-            # Set temperature for target date
-            mask = future["ds"] == pd_target_date
-            future.loc[mask, "temperature"] = temperature
-
-            # Fill any missing temperatures with historical averages
-            for idx, row in future[future["temperature"].isna()].iterrows():
-                month = row["ds"].month
-                day = row["ds"].day
-                # Try to find month/day combination in historical averages
-                if (month, day) in target_month_avg_temps.index:
-                    future.loc[idx, "temperature"] = target_month_avg_temps.loc[
-                        (month, day)
-                    ]
-                else:
-                    # Fallback to month average
-                    month_avg = historical_data[
-                        historical_data["ds"].dt.month == month
-                    ]["temperature"].mean()
-                    future.loc[idx, "temperature"] = (
-                        month_avg if not np.isnan(month_avg) else avg_temp
-                    )
-
-            # Ensure no NaN values remain
-            future["temperature"] = future["temperature"].fillna(avg_temp)
-
-            # Make predictions
-            forecast = model.predict(future)
+            # Forecast a week around the target date (3 days before and 3 after), only those
+            # days are predicted and days already predicted with the same temperature are cached
+            # temperatures: recorded history, the chosen one on the target date, then averages
+            start_date = pd_target_date - pd.Timedelta(days=3)
+            end_date = pd_target_date + pd.Timedelta(days=3)
+            # the precomputed grid answers by lookup once it is ready
+            result = grid.window(start_date, end_date, pd_target_date, temperature)
+            if result is not None:
+                forecast, stats = result
+                source = "precomputed forecast"
+            else:
+                if grid.error is not None:
+                    # the service still answers, the grid just wont speed it up
+                    st.warning(f"Precomputing the forecast failed, predicting on demand: {grid.error}")
+                forecast, stats = service.forecast(
+                    start_date, end_date, pd_target_date, temperature, avg_temp
+                )
+                source = f"{stats['predicted']} days predicted, {stats['cached']} from cache"
+            st.caption(f"Forecast in {stats['seconds'] * 1000:.0f} ms ({source})")
 
             # Extract prediction for target date
             target_forecast = forecast[forecast["ds"] == pd_target_date]
@@ -234,13 +261,8 @@ if model_data:
                 # Optional: Show forecast for the next few days
                 st.subheader("Forecast Trend")
 
-                # Get forecast for a week around the target date (3 days before and 3 after)
-                start_date = pd_target_date - pd.Timedelta(days=3)
-                end_date = pd_target_date + pd.Timedelta(days=3)
-
-                trend_forecast = forecast[
-                    (forecast["ds"] >= start_date) & (forecast["ds"] <= end_date)
-                ]
+                # the forecast already is the week around the target date
+                trend_forecast = forecast
 
                 # Create the plot
                 fig = go.Figure()